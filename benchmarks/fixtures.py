@@ -0,0 +1,153 @@
+"""
+Synthetic fixtures for the benchmark suite; everything is generated locally, so the
+benchmarks run offline and without the real photos, descriptions or embeddings.
+
+- make_tiny_clip(): a small randomly initialized CLIP checkpoint (same architecture
+  and preprocessing as openai/clip-vit-base-patch32, far fewer parameters) with a
+  byte-level tokenizer
+- make_photos(): smooth random JPEG photos named like the dataset (cat.N.jpg, dog.N.jpg)
+- make_descriptions(): description texts, some longer than CLIP's context
+- make_packed_sets(): class-separable image and text embedding sets in the packed
+  vector store layout
+"""
+
+import os
+import json
+import numpy as np
+from PIL import Image
+from typing import List
+
+from preprocessing.vectorize.vector_store import write_embedding_set
+
+WORDS = (
+    "small medium large animal grey black white brown orange striped spotted short "
+    "long fur coat ears pointed floppy tail sitting lying standing indoors outdoors "
+    "on a wooden floor grass sofa blanket near window looking at the camera calmly"
+).split()
+
+
+def sample_ids(n: int) -> List[str]:
+    """Dataset-style sample IDs, alternating classes (cat.0, dog.1, ...)."""
+    return [f"{'cat' if i % 2 == 0 else 'dog'}.{i}" for i in range(n)]
+
+
+def _bytes_to_unicode() -> dict:
+    # GPT-2/CLIP byte-level alphabet: every byte maps to a printable character
+    printable = (
+        list(range(ord("!"), ord("~") + 1))
+        + list(range(ord("¡"), ord("¬") + 1))
+        + list(range(ord("®"), ord("ÿ") + 1))
+    )
+    chars = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            chars.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, [chr(c) for c in chars]))
+
+
+def make_tiny_clip(out_dir: str, hidden_size: int = 64, projection_dim: int = 32) -> str:
+    """Write a randomly initialized CLIP checkpoint and processor to 'out_dir'."""
+    import torch
+    from transformers import (
+        CLIPConfig,
+        CLIPImageProcessor,
+        CLIPModel,
+        CLIPProcessor,
+        CLIPTokenizerFast,
+    )
+
+    os.makedirs(out_dir, exist_ok=True)
+    chars = list(_bytes_to_unicode().values())
+    vocab = {}
+    for suffix in ("", "</w>"):
+        for char in chars:
+            vocab[char + suffix] = len(vocab)
+    vocab["<|startoftext|>"] = len(vocab)
+    vocab["<|endoftext|>"] = len(vocab)
+    vocab_file = os.path.join(out_dir, "vocab.json")
+    merges_file = os.path.join(out_dir, "merges.txt")
+    with open(vocab_file, "w") as f:
+        json.dump(vocab, f)
+    with open(merges_file, "w") as f:
+        f.write("#version: 0.2\n")
+    tokenizer = CLIPTokenizerFast(vocab_file=vocab_file, merges_file=merges_file)
+
+    n_vocab = len(vocab)
+    tower = dict(
+        hidden_size=hidden_size,
+        intermediate_size=4 * hidden_size,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+    )
+    config = CLIPConfig(
+        text_config=dict(
+            tower,
+            vocab_size=n_vocab,
+            max_position_embeddings=77,
+            bos_token_id=n_vocab - 2,
+            eos_token_id=n_vocab - 1,
+            pad_token_id=n_vocab - 1,
+        ),
+        vision_config=dict(tower, image_size=224, patch_size=32),
+        projection_dim=projection_dim,
+    )
+    torch.manual_seed(0)
+    CLIPModel(config).save_pretrained(out_dir)
+    CLIPProcessor(image_processor=CLIPImageProcessor(), tokenizer=tokenizer).save_pretrained(
+        out_dir
+    )
+    return out_dir
+
+
+def make_photos(
+    out_dir: str, n: int, size=(500, 375), seed: int = 0, quality: int = 90
+) -> List[str]:
+    """Write 'n' smooth random RGB JPEGs (about the dataset's typical size)."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for sample_id in sample_ids(n):
+        coarse = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+        image = Image.fromarray(coarse).resize(size, Image.BICUBIC)
+        noise = rng.normal(0, 8, size=(size[1], size[0], 3))
+        pixels = np.clip(np.asarray(image, dtype=np.float64) + noise, 0, 255)
+        path = os.path.join(out_dir, f"{sample_id}.jpg")
+        Image.fromarray(pixels.astype(np.uint8)).save(path, quality=quality)
+        paths.append(path)
+    return paths
+
+
+def make_descriptions(n: int, seed: int = 0, long_fraction: float = 0.1) -> List[str]:
+    """'n' descriptions of 8-40 words; 'long_fraction' of them exceed 77 tokens."""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n):
+        n_words = 120 if rng.random() < long_fraction else int(rng.integers(8, 40))
+        texts.append(" ".join(rng.choice(WORDS, size=n_words)))
+    return texts
+
+
+def make_packed_sets(
+    root: str,
+    n: int,
+    dim: int = 512,
+    seed: int = 0,
+    image_sets=("image/high_info", "image/low_info/dropout_50"),
+    text_sets=("text/high_info", "text/low_info"),
+):
+    """
+    Write class-separable packed sets under 'root': each set is a per-class mean
+    plus noise, with noisier sets later in each list (like lower-info sets).
+    """
+    rng = np.random.default_rng(seed)
+    ids = sample_ids(n)
+    labels = np.array([0 if sample_id.startswith("cat") else 1 for sample_id in ids])
+    for names in (image_sets, text_sets):
+        means = rng.normal(0, 1, size=(2, dim))
+        for rank, name in enumerate(names):
+            noise = rng.normal(0, 4.0 * (rank + 1), size=(n, dim))
+            write_embedding_set(name, means[labels] + noise, ids, root)
+    return ids
@@ -0,0 +1,569 @@
+"""
+Benchmark the pipeline stages on synthetic data, offline.
+
+Each stage is measured on its own and the whole pipeline end to end:
+
+    image_decode          JPEG decode + RGB conversion (PIL)
+    pixel_dropout         nested dropout masks for all levels (apply_pixel_dropout.py)
+    clip_preprocess       CLIP image preprocessing (resize, crop, normalize)
+    clip_image_inference  image tower on preprocessed batches (create_embeddings.py)
+    clip_text             tokenization + text tower, incl. long-text windows
+    npy_write / npy_read  packed embedding set I/O (vector_store.py)
+    fusion                ModalityPair alignment + fusion of the alpha grid (fusion.py)
+    cv_logreg             5-fold logistic regression alpha sweep (alpha_sweep.py)
+    cv_svm                5-fold precomputed-kernel RBF SVM alpha sweep (svm.py)
+    cv_knn                5-fold approximate kNN alpha sweep (knn.py)
+    ann_build             IVF index build over a large image set (ann_index.py)
+    ann_load              loading the saved index
+    ann_query             batched top-k cosine queries against the index
+    end_to_end            photos + descriptions -> embeddings -> packed sets -> CV
+
+All inputs come from benchmarks/fixtures.py; CLIP is a small randomly initialized
+checkpoint with the real architecture and preprocessing, so inference timings scale
+with the real model but are not equal to it. Every stage runs in a fresh process
+(so peak RSS is per stage), with warm-up runs followed by timed repeats.
+
+Each run is appended to benchmarks/results/history.json with latency percentiles,
+throughput, CPU time and peak RSS per stage, and compared with the stored baseline
+(benchmarks/results/baseline.json): a stage whose throughput drops, or whose peak
+RSS grows, by more than --threshold is flagged and the script exits with status 1.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --quick --stages fusion cv_logreg
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+import numpy as np
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+RESULTS_DIR = "benchmarks/results"
+HISTORY_PATH = os.path.join(RESULTS_DIR, "history.json")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+
+REPEATS = 5
+WARMUP = 1
+REGRESSION_THRESHOLD = 0.10
+RSS_NOISE_MB = 16  # Peak RSS differences below this are never flagged
+
+SIZES = {
+    "photos": 64,
+    "texts": 256,
+    "samples": 2000,
+    "dim": 512,
+    "batch_size": 32,
+    "ann_samples": 50000,
+    "ann_queries": 1000,
+}
+QUICK_SIZES = {
+    "photos": 16,
+    "texts": 64,
+    "samples": 400,
+    "dim": 512,
+    "batch_size": 16,
+    "ann_samples": 5000,
+    "ann_queries": 200,
+}
+ANN_K = 10
+
+ALPHAS = [0.0, 0.25, 0.5, 0.75, 1.0]
+DROPOUT_LEVELS = [25, 50, 75, 90]
+
+
+# --- Stages -------------------------------------------------------------------
+# Each stage does its (untimed) setup and returns run() -> number of items processed.
+
+
+def _decoded_photos(fx):
+    from PIL import Image
+
+    images = []
+    for path in fx["photos"]:
+        with Image.open(path) as image:
+            images.append(image.convert("RGB"))
+    return images
+
+
+def stage_image_decode(fx):
+    from PIL import Image
+
+    def run():
+        for path in fx["photos"]:
+            with Image.open(path) as image:
+                image.convert("RGB").load()
+        return len(fx["photos"])
+
+    return run
+
+
+def stage_pixel_dropout(fx):
+    from preprocessing.images.apply_pixel_dropout import apply_dropout_levels, image_rng
+
+    arrays = [np.asarray(image) for image in _decoded_photos(fx)]
+    names = [os.path.basename(path) for path in fx["photos"]]
+
+    def run():
+        for name, array in zip(names, arrays):
+            apply_dropout_levels(array, DROPOUT_LEVELS, image_rng(name))
+        return len(arrays)
+
+    return run
+
+
+def stage_clip_preprocess(fx):
+    from preprocessing.vectorize import create_embeddings
+
+    images = _decoded_photos(fx)
+    image_processor = create_embeddings.processor.image_processor
+
+    def run():
+        for image in images:
+            image_processor(images=image, return_tensors="pt")
+        return len(images)
+
+    return run
+
+
+def stage_clip_image_inference(fx):
+    from preprocessing.vectorize import create_embeddings
+
+    images = _decoded_photos(fx)
+    pixels = create_embeddings.processor.image_processor(
+        images=images, return_tensors="pt"
+    )["pixel_values"]
+    batch_size = fx["sizes"]["batch_size"]
+    batches = [pixels[i : i + batch_size] for i in range(0, len(pixels), batch_size)]
+
+    def run():
+        return len(create_embeddings.embed_pixel_batches(batches))
+
+    return run
+
+
+def stage_clip_text(fx):
+    from preprocessing.vectorize import create_embeddings
+
+    def run():
+        embeddings = create_embeddings.embed_texts(
+            fx["texts"], batch_size=fx["sizes"]["batch_size"]
+        )
+        return len(embeddings)
+
+    return run
+
+
+def stage_npy_write(fx):
+    from preprocessing.vectorize.vector_store import load_embedding_set, write_embedding_set
+
+    vectors, _, ids = load_embedding_set("image/high_info", fx["packed_root"], mmap=False)
+    root = os.path.join(fx["scratch"], "npy_write")
+
+    def run():
+        write_embedding_set("image/high_info", vectors, ids, root)
+        return len(ids)
+
+    return run
+
+
+def stage_npy_read(fx):
+    from preprocessing.vectorize.vector_store import load_embedding_set
+
+    def run():
+        vectors, _, _ = load_embedding_set("image/high_info", fx["packed_root"], mmap=False)
+        return len(vectors)
+
+    return run
+
+
+def stage_fusion(fx):
+    from preprocessing.combine.fusion import ModalityPair
+
+    def run():
+        pair = ModalityPair("image/low_info/dropout_50", "text/high_info", fx["packed_root"])
+        pair.fuse_grid(ALPHAS)
+        return len(pair) * len(ALPHAS)
+
+    return run
+
+
+def stage_cv_logreg(fx):
+    from classifiers.alpha_sweep import sweep_alphas
+    from preprocessing.combine.fusion import ModalityPair
+
+    pair = ModalityPair("image/low_info/dropout_50", "text/high_info", fx["packed_root"])
+
+    def run():
+        sweep_alphas(pair, ALPHAS, n_jobs=1)
+        return len(ALPHAS)
+
+    return run
+
+
+def stage_cv_svm(fx):
+    from classifiers.svm import evaluate_svm_precomputed
+    from preprocessing.combine.fusion import ModalityPair
+
+    pair = ModalityPair("image/low_info/dropout_50", "text/high_info", fx["packed_root"])
+
+    def run():
+        evaluate_svm_precomputed(pair, ALPHAS)
+        return len(ALPHAS)
+
+    return run
+
+
+def stage_cv_knn(fx):
+    from classifiers.knn import evaluate_knn
+    from preprocessing.combine.fusion import ModalityPair
+
+    pair = ModalityPair("image/low_info/dropout_50", "text/high_info", fx["packed_root"])
+
+    def run():
+        evaluate_knn(pair, ALPHAS)
+        return len(ALPHAS)
+
+    return run
+
+
+def stage_ann_build(fx):
+    from preprocessing.vectorize.ann_index import build_set_index
+
+    ann_root = os.path.join(fx["scratch"], "ann_build")
+
+    def run():
+        index, _, _ = build_set_index("image/high_info", fx["ann_packed_root"], ann_root)
+        return len(index)
+
+    return run
+
+
+def stage_ann_load(fx):
+    from preprocessing.vectorize.ann_index import ann_dir, build_set_index, IVFIndex
+
+    ann_root = os.path.join(fx["scratch"], "ann_load")
+    build_set_index("image/high_info", fx["ann_packed_root"], ann_root)
+    index_dir = ann_dir("image/high_info", ann_root)
+
+    def run():
+        index, _ = IVFIndex.load(index_dir)
+        return len(index)
+
+    return run
+
+
+def stage_ann_query(fx):
+    from preprocessing.vectorize.ann_index import build_set_index
+    from preprocessing.vectorize.vector_store import load_embedding_set
+
+    ann_root = os.path.join(fx["scratch"], "ann_query")
+    index, _, _ = build_set_index("image/high_info", fx["ann_packed_root"], ann_root)
+    queries, _, _ = load_embedding_set("text/high_info", fx["ann_packed_root"])
+    queries = np.asarray(queries[: fx["sizes"]["ann_queries"]])
+
+    def run():
+        index.search(queries, ANN_K)
+        return len(queries)
+
+    return run
+
+
+def stage_end_to_end(fx):
+    from classifiers.alpha_sweep import sweep_alphas
+    from preprocessing.combine.fusion import ModalityPair
+    from preprocessing.vectorize import create_embeddings
+    from preprocessing.vectorize.vector_store import write_embedding_set
+
+    paths = fx["photos"]
+    ids = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    texts = fx["texts"][: len(paths)]
+    root = os.path.join(fx["scratch"], "end_to_end")
+    batch_size = fx["sizes"]["batch_size"]
+
+    def run():
+        image = create_embeddings.embed_images(paths, batch_size, num_workers=0)
+        text = create_embeddings.embed_texts(texts, batch_size)
+        write_embedding_set("image/high_info", image, ids, root)
+        write_embedding_set("text/high_info", text, ids, root)
+        sweep_alphas(ModalityPair("image/high_info", "text/high_info", root), ALPHAS, n_jobs=1)
+        return len(paths)
+
+    return run
+
+
+STAGES = {
+    "image_decode": stage_image_decode,
+    "pixel_dropout": stage_pixel_dropout,
+    "clip_preprocess": stage_clip_preprocess,
+    "clip_image_inference": stage_clip_image_inference,
+    "clip_text": stage_clip_text,
+    "npy_write": stage_npy_write,
+    "npy_read": stage_npy_read,
+    "fusion": stage_fusion,
+    "cv_logreg": stage_cv_logreg,
+    "cv_svm": stage_cv_svm,
+    "cv_knn": stage_cv_knn,
+    "ann_build": stage_ann_build,
+    "ann_load": stage_ann_load,
+    "ann_query": stage_ann_query,
+    "end_to_end": stage_end_to_end,
+}
+
+
+# --- Running ------------------------------------------------------------------
+
+
+def build_fixtures(fixture_dir: str, sizes: dict) -> dict:
+    """Generate every synthetic input under 'fixture_dir'; returns the fixture spec."""
+    from benchmarks.fixtures import (
+        make_descriptions,
+        make_packed_sets,
+        make_photos,
+        make_tiny_clip,
+    )
+
+    fx = {
+        "sizes": sizes,
+        "model_dir": make_tiny_clip(os.path.join(fixture_dir, "clip")),
+        "photos": make_photos(os.path.join(fixture_dir, "photos"), sizes["photos"]),
+        "texts": make_descriptions(sizes["texts"]),
+        "packed_root": os.path.join(fixture_dir, "packed"),
+        "ann_packed_root": os.path.join(fixture_dir, "ann_packed"),
+        "scratch": os.path.join(fixture_dir, "scratch"),
+    }
+    make_packed_sets(fx["packed_root"], sizes["samples"], sizes["dim"])
+    make_packed_sets(
+        fx["ann_packed_root"],
+        sizes["ann_samples"],
+        sizes["dim"],
+        image_sets=("image/high_info",),
+        text_sets=("text/high_info",),
+    )
+    return fx
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process."""
+    # VmHWM starts over at exec; ru_maxrss would include the parent's peak
+    if os.path.isfile("/proc/self/status"):
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_stage(name: str, fx: dict, repeats: int = REPEATS, warmup: int = WARMUP) -> dict:
+    """Time one stage in the current process (see measure_stage)."""
+    # Must be set before create_embeddings is first imported
+    os.environ["CLIP_MODEL_NAME"] = fx["model_dir"]
+    run = STAGES[name](fx)
+    for _ in range(warmup):
+        run()
+
+    latencies, cpu_times = [], []
+    items = 0
+    for _ in range(repeats):
+        wall, cpu = time.perf_counter(), time.process_time()
+        items = run()
+        latencies.append(time.perf_counter() - wall)
+        cpu_times.append(time.process_time() - cpu)
+
+    median = float(np.median(latencies))
+    return {
+        "items": items,
+        "repeats": repeats,
+        "latency_ms": {
+            "p50": round(1000 * median, 3),
+            "p95": round(1000 * percentile(latencies, 95), 3),
+            "min": round(1000 * min(latencies), 3),
+            "mean": round(1000 * float(np.mean(latencies)), 3),
+        },
+        "cpu_ms_p50": round(1000 * float(np.median(cpu_times)), 3),
+        "throughput": round(items / median, 3) if median > 0 else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def measure_stage(name: str, fx: dict, repeats: int, warmup: int) -> dict:
+    """Run a stage in a fresh process, so its peak RSS is its own."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_stage, name, fx, repeats, warmup).result()
+
+
+def compare(stages: dict, baseline: dict, threshold: float) -> dict:
+    """Return {stage: [problems]} for stages that regressed against 'baseline'."""
+    regressions = {}
+    for name, result in stages.items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        problems = []
+        if base.get("throughput") and result.get("throughput"):
+            change = result["throughput"] / base["throughput"] - 1
+            if change < -threshold:
+                problems.append(f"throughput {100 * change:+.1f}%")
+        rss_growth = result["peak_rss_mb"] - base["peak_rss_mb"]
+        if rss_growth > max(RSS_NOISE_MB, threshold * base["peak_rss_mb"]):
+            problems.append(f"peak RSS +{rss_growth:.0f} MB")
+        if problems:
+            regressions[name] = problems
+    return regressions
+
+
+def print_table(stages: dict, baseline: dict = None):
+    print(
+        f"\n{'stage':<22}{'items':>7}{'p50 ms':>11}{'p95 ms':>11}"
+        f"{'items/s':>12}{'RSS MB':>9}{'vs baseline':>13}"
+    )
+    for name, result in stages.items():
+        base = (baseline or {}).get("stages", {}).get(name)
+        delta = ""
+        if base and base.get("throughput") and result.get("throughput"):
+            delta = f"{100 * (result['throughput'] / base['throughput'] - 1):+.1f}%"
+        print(
+            f"{name:<22}{result['items']:>7}{result['latency_ms']['p50']:>11.1f}"
+            f"{result['latency_ms']['p95']:>11.1f}{result['throughput']:>12.1f}"
+            f"{result['peak_rss_mb']:>9.0f}{delta:>13}"
+        )
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_info() -> dict:
+    import torch
+
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+    }
+
+
+def load_json(path: str, default):
+    if not os.path.isfile(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def write_json(path: str, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--quick", action="store_true", help="smaller fixtures")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="relative change that counts as a regression (default: 0.10)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store this run as the baseline instead of comparing against it",
+    )
+    parser.add_argument(
+        "--no-history", action="store_true", help=f"do not append to {HISTORY_PATH}"
+    )
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    fixture_dir = tempfile.mkdtemp(prefix="benchmark_fixtures_")
+    try:
+        start = time.perf_counter()
+        fx = build_fixtures(fixture_dir, sizes)
+        print(f"Built synthetic fixtures in {time.perf_counter() - start:.1f}s: {sizes}")
+
+        stages = {}
+        for name in args.stages:
+            stages[name] = measure_stage(name, fx, args.repeats, args.warmup)
+            print(
+                f"  [{name}] {stages[name]['throughput']:.1f} items/s, "
+                f"p50 {stages[name]['latency_ms']['p50']:.1f} ms"
+            )
+    finally:
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "machine": machine_info(),
+        "sizes": sizes,
+        "stages": stages,
+    }
+    if not args.no_history:
+        history = load_json(HISTORY_PATH, [])
+        history.append(run)
+        write_json(HISTORY_PATH, history)
+
+    if args.save_baseline:
+        print_table(stages)
+        write_json(BASELINE_PATH, run)
+        print(f"\n✓ Saved baseline to {BASELINE_PATH}")
+        return
+
+    baseline = load_json(BASELINE_PATH, None)
+    if baseline is not None and baseline.get("sizes") != sizes:
+        print(f"Baseline in {BASELINE_PATH} used other fixture sizes; not comparing.")
+        baseline = None
+    print_table(stages, baseline)
+    if baseline is None:
+        print("\nNo baseline to compare against (create one with --save-baseline).")
+        return
+
+    regressions = compare(stages, baseline, args.threshold)
+    recorded = f"{baseline.get('commit')}, {baseline.get('timestamp')}"
+    if regressions:
+        print(f"\n❌ Regressions against baseline ({recorded}):")
+        for name, problems in regressions.items():
+            print(f"  {name}: {', '.join(problems)}")
+        sys.exit(1)
+    print(f"\n✅ No regressions against baseline ({recorded}).")
+
+
+if __name__ == "__main__":
+    main()
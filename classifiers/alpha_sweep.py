@@ -0,0 +1,219 @@
+"""
+Cross-validate logistic regression over a whole (dropout, pair, alpha) grid at once.
+
+Instead of one independent cross-validation per cell, the sweep:
+  - loads each image/text pair once and fuses folds in memory (see fusion.py)
+  - builds one StratifiedKFold split and reuses it for every cell with the same labels
+  - walks the alphas of each (dropout, pair, fold) in sorted order, warm-starting
+    every fit from the coefficients of its neighbouring alpha
+  - runs the independent (dropout, pair, fold) chains in parallel across all cores
+
+The result has one row per cell:
+    [dropout_level, representation, alpha, accuracy_mean, accuracy_std]
+
+refine_alphas() instead searches for the best alpha of one pair: it evaluates a coarse
+grid, then narrows in on the accuracy peak with a golden-section search, reusing the
+same folds and warm-starting every new fit from the nearest alpha already fitted.
+"""
+
+import math
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+from joblib import Parallel, delayed
+from sklearn.linear_model import LogisticRegression
+
+from classifiers.evaluation import fold_splits
+from instrumentation.tracing import traced
+from preprocessing.combine.fusion import ModalityPair
+
+
+def _fit_alpha_chain(
+    image: np.ndarray,
+    text: np.ndarray,
+    labels: np.ndarray,
+    train_idx: np.ndarray,
+    test_idx: np.ndarray,
+    alphas: Sequence[float],
+    max_iter: int,
+) -> List[float]:
+    """Fold accuracy for each alpha, warm-starting each fit from the previous alpha."""
+    img_train, img_test = image[train_idx], image[test_idx]
+    txt_train, txt_test = text[train_idx], text[test_idx]
+    y_train, y_test = labels[train_idx], labels[test_idx]
+
+    clf = LogisticRegression(max_iter=max_iter, warm_start=True)
+    accuracies = []
+    for alpha in alphas:
+        clf.fit(alpha * img_train + (1 - alpha) * txt_train, y_train)
+        preds = clf.predict(alpha * img_test + (1 - alpha) * txt_test)
+        accuracies.append(float(np.mean(preds == y_test)))
+    return accuracies
+
+
+def sweep_alphas(
+    pair: ModalityPair,
+    alphas: Sequence[float],
+    cv: int = 5,
+    random_state: int = 42,
+    n_jobs: int = -1,
+    max_iter: int = 1000,
+) -> List[Tuple[float, float, float]]:
+    """Return (alpha, accuracy_mean, accuracy_std) for every alpha of one pair."""
+    rows = sweep_grid({None: {None: pair}}, alphas, cv, random_state, n_jobs, max_iter)
+    return [(alpha, mean, std) for _, _, alpha, mean, std in rows]
+
+
+@traced()
+def sweep_grid(
+    grid,
+    alphas: Sequence[float],
+    cv: int = 5,
+    random_state: int = 42,
+    n_jobs: int = -1,
+    max_iter: int = 1000,
+) -> List[list]:
+    """
+    Cross-validate every alpha of every pair in 'grid', a nested mapping
+    {dropout_level: {representation: ModalityPair}}.
+    Returns rows [dropout_level, representation, alpha, accuracy_mean, accuracy_std]
+    in grid order, with alphas in the order given.
+    """
+    chain_alphas = sorted(alphas)
+
+    # One split per distinct label vector; aligned pairs usually share a single one
+    split_cache = {}
+    tasks, cells = [], []
+    for dropout_level, pairs in grid.items():
+        for representation, pair in pairs.items():
+            label_key = pair.labels.tobytes()
+            if label_key not in split_cache:
+                split_cache[label_key] = fold_splits(pair.labels, cv, random_state)
+            for train_idx, test_idx in split_cache[label_key]:
+                tasks.append(
+                    delayed(_fit_alpha_chain)(
+                        pair.image,
+                        pair.text,
+                        pair.labels,
+                        train_idx,
+                        test_idx,
+                        chain_alphas,
+                        max_iter,
+                    )
+                )
+            cells.append((dropout_level, representation, len(split_cache[label_key])))
+
+    results = Parallel(n_jobs=n_jobs)(tasks)
+
+    rows, task = [], 0
+    for dropout_level, representation, n_folds in cells:
+        # (n_folds, n_alphas) fold accuracies for this cell
+        scores = np.array(results[task : task + n_folds])
+        task += n_folds
+        for alpha in alphas:
+            fold_scores = scores[:, chain_alphas.index(alpha)]
+            rows.append(
+                [
+                    dropout_level,
+                    representation,
+                    alpha,
+                    float(fold_scores.mean()),
+                    float(fold_scores.std()),
+                ]
+            )
+    return rows
+
+
+INV_PHI = (math.sqrt(5) - 1) / 2  # golden ratio conjugate, ~0.618
+
+
+class _FoldModels:
+    """
+    Logistic regression fits of one pair over its CV folds, keyed by alpha.
+    A new alpha warm-starts each fold from the fitted alpha closest to it.
+    """
+
+    def __init__(self, pair: ModalityPair, cv: int, random_state: int, max_iter: int):
+        self.pair = pair
+        self.folds = fold_splits(pair.labels, cv, random_state)
+        self.max_iter = max_iter
+        self.params: Dict[float, list] = {}  # alpha -> [(coef, intercept)] per fold
+        self.scores: Dict[float, Tuple[float, float]] = {}  # alpha -> (mean, std)
+
+    def evaluate(self, alpha: float) -> float:
+        alpha = round(alpha, 4)
+        if alpha in self.scores:
+            return self.scores[alpha][0]
+
+        nearest = min(self.params, key=lambda a: abs(a - alpha), default=None)
+        image, text, labels = self.pair.image, self.pair.text, self.pair.labels
+        accuracies, params = [], []
+        for fold, (train_idx, test_idx) in enumerate(self.folds):
+            clf = LogisticRegression(max_iter=self.max_iter, warm_start=True)
+            if nearest is not None:
+                coef, intercept = self.params[nearest][fold]
+                clf.coef_, clf.intercept_ = coef.copy(), intercept.copy()
+            fused_train = alpha * image[train_idx] + (1 - alpha) * text[train_idx]
+            clf.fit(fused_train, labels[train_idx])
+            preds = clf.predict(alpha * image[test_idx] + (1 - alpha) * text[test_idx])
+            accuracies.append(float(np.mean(preds == labels[test_idx])))
+            params.append((clf.coef_, clf.intercept_))
+
+        self.params[alpha] = params
+        self.scores[alpha] = (float(np.mean(accuracies)), float(np.std(accuracies)))
+        return self.scores[alpha][0]
+
+
+@traced()
+def refine_alphas(
+    pair: ModalityPair,
+    alphas: Sequence[float],
+    cv: int = 5,
+    random_state: int = 42,
+    tolerance: float = 0.01,
+    max_evals: int = 20,
+    max_iter: int = 1000,
+) -> List[Tuple[float, float, float]]:
+    """
+    Evaluate the coarse grid 'alphas', then golden-section search the bracket around
+    the best one until it is narrower than 'tolerance' (or 'max_evals' alphas have
+    been evaluated in total). CV accuracy is often flat around the peak: when the
+    two inner points score the same (within one prediction's share of the mean
+    accuracy), the search stops unless both beat the coarse peak, in which case the
+    bracket shrinks onto them, keeping it centred. Returns (alpha, accuracy_mean, accuracy_std) for every
+    alpha evaluated, sorted by alpha; the best of them is the refined optimum.
+    """
+    models = _FoldModels(pair, cv, random_state, max_iter)
+    coarse = sorted(alphas)
+    for alpha in coarse:
+        models.evaluate(alpha)
+
+    # Bracket the coarse peak by its neighbours (ties go to the smallest alpha)
+    best = max(coarse, key=lambda a: models.scores[round(a, 4)][0])
+    i = coarse.index(best)
+    low, high = coarse[max(i - 1, 0)], coarse[min(i + 1, len(coarse) - 1)]
+
+    best_score = models.scores[round(best, 4)][0]
+    # Half the smallest step of the mean accuracy (one prediction flipping)
+    tie = 0.5 / len(pair.labels)
+
+    x1 = high - INV_PHI * (high - low)
+    x2 = low + INV_PHI * (high - low)
+    f1, f2 = models.evaluate(x1), models.evaluate(x2)
+    while high - low > tolerance and len(models.scores) < max_evals:
+        if abs(f1 - f2) < tie:
+            if f1 < best_score + tie:
+                break  # A plateau no better than the coarse peak
+            low, high = x1, x2
+            x1 = high - INV_PHI * (high - low)
+            x2 = low + INV_PHI * (high - low)
+            f1, f2 = models.evaluate(x1), models.evaluate(x2)
+        elif f1 > f2:
+            high, x2, f2 = x2, x1, f1
+            x1 = high - INV_PHI * (high - low)
+            f1 = models.evaluate(x1)
+        else:
+            low, x1, f1 = x1, x2, f2
+            x2 = low + INV_PHI * (high - low)
+            f2 = models.evaluate(x2)
+
+    return [(alpha, *models.scores[alpha]) for alpha in sorted(models.scores)]
@@ -0,0 +1,98 @@
+"""
+Single-pass cross-validation shared by the classifiers.
+
+Each fold model is fitted exactly once, and everything the experiments and their
+debug output need is collected from that one fit: per-fold accuracy, out-of-fold
+predictions and decision scores, the confusion matrix, and fit/predict timings.
+"""
+
+import time
+import numpy as np
+from dataclasses import dataclass
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import confusion_matrix, classification_report
+
+from instrumentation.tracing import traced
+from preprocessing.vectorize.vector_store import CLASS_NAMES
+
+
+@dataclass
+class CVResult:
+    labels: np.ndarray
+    fold_accuracies: np.ndarray
+    predictions: np.ndarray  # out-of-fold predictions
+    decision_scores: np.ndarray  # out-of-fold decision_function values
+    fit_times: np.ndarray  # seconds per fold
+    predict_times: np.ndarray  # seconds per fold
+
+    @property
+    def accuracy_mean(self) -> float:
+        return float(self.fold_accuracies.mean())
+
+    @property
+    def accuracy_std(self) -> float:
+        return float(self.fold_accuracies.std())
+
+    @property
+    def confusion(self) -> np.ndarray:
+        return confusion_matrix(self.labels, self.predictions)
+
+    def report(self) -> str:
+        return classification_report(
+            self.labels, self.predictions, target_names=CLASS_NAMES
+        )
+
+    def print_debug(self):
+        print("[DEBUG] Fold accuracies:", np.round(self.fold_accuracies, 3))
+        print(
+            f"[DEBUG] Fit time: {self.fit_times.sum():.2f}s, "
+            f"predict time: {self.predict_times.sum():.2f}s"
+        )
+        print("[DEBUG] Confusion Matrix:\n", self.confusion)
+        print("[DEBUG] Classification Report:\n", self.report())
+
+
+def fold_splits(labels: np.ndarray, cv: int = 5, random_state: int = 42):
+    """Return the (train_idx, test_idx) folds shared by every cell with these labels."""
+    kf = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    return list(kf.split(np.zeros((len(labels), 1)), labels))
+
+
+@traced()
+def cross_validate_once(
+    clf, embeddings: np.ndarray, labels: np.ndarray, cv: int = 5, random_state: int = 42
+) -> CVResult:
+    """
+    Run stratified k-fold cross-validation of a binary classifier 'clf',
+    fitting each fold once.
+    """
+    n_samples = len(labels)
+    predictions = np.empty(n_samples, dtype=labels.dtype)
+    decision_scores = np.empty(n_samples, dtype=np.float64)
+    fold_accuracies, fit_times, predict_times = [], [], []
+
+    for train_idx, test_idx in fold_splits(labels, cv, random_state):
+        model = clone(clf)
+
+        start = time.perf_counter()
+        model.fit(embeddings[train_idx], labels[train_idx])
+        fit_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scores = model.decision_function(embeddings[test_idx])
+        fold_preds = model.classes_[(scores > 0).astype(int)]
+        predict_times.append(time.perf_counter() - start)
+
+        predictions[test_idx] = fold_preds
+        decision_scores[test_idx] = scores
+        fold_accuracies.append(np.mean(fold_preds == labels[test_idx]))
+
+    return CVResult(
+        labels=labels,
+        fold_accuracies=np.array(fold_accuracies),
+        predictions=predictions,
+        decision_scores=decision_scores,
+        fit_times=np.array(fit_times),
+        predict_times=np.array(predict_times),
+    )
@@ -0,0 +1,98 @@
+import numpy as np
+from typing import List, Sequence, Tuple
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+from classifiers.evaluation import cross_validate_once
+from instrumentation.tracing import traced
+from preprocessing.vectorize.ann_index import IVFIndex
+from preprocessing.vectorize.vector_store import load_vectors_labels
+
+K_NEIGHBORS = 15
+
+
+class ANNKNNClassifier(ClassifierMixin, BaseEstimator):
+    """
+    k-nearest-neighbour classifier by cosine similarity, searching an IVF index of
+    the training rows (see preprocessing/vectorize/ann_index.py). Each neighbour
+    votes with its similarity, so near neighbours count more than far ones.
+    """
+
+    def __init__(self, k: int = K_NEIGHBORS, n_lists: int = None, nprobe: int = None):
+        self.k = k
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+
+    def fit(self, X, y):
+        self.classes_, self.y_ = np.unique(y, return_inverse=True)
+        self.index_ = IVFIndex.build(X, self.n_lists, self.nprobe)
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores, rows = self.index_.search(X, self.k)
+        found = rows >= 0
+        weights = np.where(found, np.maximum(scores, 0.0) + 1e-6, 0.0)
+        votes = np.zeros((len(rows), len(self.classes_)))
+        for c in range(len(self.classes_)):
+            votes[:, c] = (weights * (self.y_[np.maximum(rows, 0)] == c)).sum(axis=1)
+        return votes / np.maximum(votes.sum(axis=1, keepdims=True), 1e-12)
+
+    def decision_function(self, X) -> np.ndarray:
+        """Binary only: vote share of classes_[1] minus that of classes_[0]."""
+        proba = self.predict_proba(X)
+        return proba[:, 1] - proba[:, 0]
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def evaluate_knn_classifier(
+    embeddings_source,
+    cv: int = 5,
+    random_state: int = 42,
+    debug: bool = False,
+    *,
+    k: int = K_NEIGHBORS,
+) -> Tuple[float, float]:
+    """
+    Evaluate an approximate kNN classifier on 'embeddings_source':
+    a FusedView, a packed embedding set, or a legacy folder of per-sample .npy files.
+    Returns the mean and std of cross-validation accuracy.
+    Optionally prints debug info (label distribution, confusion matrix, etc.).
+    """
+
+    embeddings, labels = load_vectors_labels(embeddings_source)
+
+    if debug:
+        print(f"\n[DEBUG] Loading embeddings from: {embeddings_source}")
+        print(f"[DEBUG] embeddings.shape: {embeddings.shape}")
+        unique_labels, counts = np.unique(labels, return_counts=True)
+        print(f"[DEBUG] Label distribution: {dict(zip(unique_labels, counts))}")
+
+    clf = ANNKNNClassifier(k=k)
+    result = cross_validate_once(clf, embeddings, labels, cv, random_state)
+
+    if debug:
+        result.print_debug()
+
+    return result.accuracy_mean, result.accuracy_std
+
+
+@traced()
+def evaluate_knn(
+    pair,
+    alphas: Sequence[float],
+    cv: int = 5,
+    random_state: int = 42,
+    k: int = K_NEIGHBORS,
+) -> List[Tuple[float, float, float]]:
+    """
+    Evaluate the approximate kNN classifier on a ModalityPair for every alpha.
+    Returns (alpha, accuracy_mean, accuracy_std) for every alpha.
+    """
+    results = []
+    for alpha in alphas:
+        result = cross_validate_once(
+            ANNKNNClassifier(k=k), pair.fuse(alpha), pair.labels, cv, random_state
+        )
+        results.append((alpha, result.accuracy_mean, result.accuracy_std))
+    return results
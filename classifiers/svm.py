@@ -1,50 +1,122 @@
 import numpy as np
-from pathlib import Path
-from typing import Tuple
+from typing import List, Sequence, Tuple
 from sklearn.svm import SVC
-from sklearn.model_selection import StratifiedKFold, cross_val_score, cross_val_predict
-from sklearn.metrics import confusion_matrix, classification_report
+
+from classifiers.evaluation import cross_validate_once, fold_splits
+from instrumentation.tracing import traced
+from preprocessing.vectorize.vector_store import load_vectors_labels
 
 
 def evaluate_svm_classifier(
-    embedding_folder: str, cv: int = 5, random_state: int = 42, debug: bool = False
+    embeddings_source,
+    cv: int = 5,
+    random_state: int = 42,
+    debug: bool = False,
+    *,
+    probability: bool = False,
 ) -> Tuple[float, float]:
     """
-    Evaluate an SVM (RBF kernel) classifier on embeddings in 'embedding_folder'.
+    Evaluate an SVM (RBF kernel) classifier on 'embeddings_source':
+    a FusedView, a packed embedding set, or a legacy folder of per-sample .npy files.
     Returns the mean and std of cross-validation accuracy.
     Optionally prints debug info (label distribution, confusion matrix, etc.).
-    """
 
-    def load_vectors_labels(path):
-        vectors, labels = [], []
-        for file in Path(path).glob("*.npy"):
-            vec = np.load(file)
-            label = 0 if "cat" in file.name else 1
-            vectors.append(vec)
-            labels.append(label)
-        return np.array(vectors), np.array(labels)
+    Predictions come from the sign of decision_function, so accuracy does not
+    depend on 'probability'; setting it also fits SVC's internal Platt scaling,
+    as this function used to, which makes every fit several times slower.
+    """
 
-    embeddings, labels = load_vectors_labels(embedding_folder)
+    embeddings, labels = load_vectors_labels(embeddings_source)
 
     if debug:
-        print(f"\n[DEBUG] Loading embeddings from: {embedding_folder}")
+        print(f"\n[DEBUG] Loading embeddings from: {embeddings_source}")
         print(f"[DEBUG] embeddings.shape: {embeddings.shape}")
         unique_labels, counts = np.unique(labels, return_counts=True)
         print(f"[DEBUG] Label distribution: {dict(zip(unique_labels, counts))}")
 
-    clf = SVC(kernel="rbf", probability=True)
-    kf = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
-
-    scores = cross_val_score(clf, embeddings, labels, cv=kf, scoring="accuracy")
-    accuracy_mean, accuracy_std = scores.mean(), scores.std()
+    # scikit-learn >= 1.9 deprecates the probability parameter and warns whenever
+    # it is passed, so it is only passed when asked for
+    clf = SVC(kernel="rbf", probability=True) if probability else SVC(kernel="rbf")
+    result = cross_validate_once(clf, embeddings, labels, cv, random_state)
 
     if debug:
-        preds = cross_val_predict(clf, embeddings, labels, cv=kf)
-        cm = confusion_matrix(labels, preds)
-        print("[DEBUG] Confusion Matrix:\n", cm)
-        print(
-            "[DEBUG] Classification Report:\n",
-            classification_report(labels, preds, target_names=["cat", "dog"]),
+        result.print_debug()
+
+    return result.accuracy_mean, result.accuracy_std
+
+
+class PairDistances:
+    """
+    Alpha-independent pieces of the pairwise squared distances of a ModalityPair.
+
+    For fused vectors x = a*I + (1-a)*T the squared distance expands to
+        ||x_i - x_j||^2 = a^2 D_II + (1-a)^2 D_TT + 2a(1-a) C
+    where D_II and D_TT are the image-image and text-text squared distances and
+    C_ij = <I_i - I_j, T_i - T_j> is the cross term. All three are computed once,
+    so each alpha's distance matrix is a cheap weighted sum.
+    """
+
+    def __init__(self, pair):
+        image = np.asarray(pair.image, dtype=np.float64)
+        text = np.asarray(pair.text, dtype=np.float64)
+        self.pair = pair
+
+        gram_ii = image @ image.T
+        gram_tt = text @ text.T
+        gram_it = image @ text.T
+
+        sq_i, sq_t, cross = np.diag(gram_ii), np.diag(gram_tt), np.diag(gram_it)
+        self.d_ii = sq_i[:, None] + sq_i[None, :] - 2 * gram_ii
+        self.d_tt = sq_t[:, None] + sq_t[None, :] - 2 * gram_tt
+        self.c_it = cross[:, None] + cross[None, :] - gram_it - gram_it.T
+
+    def squared_distances(self, alpha: float) -> np.ndarray:
+        sq_dist = (
+            alpha**2 * self.d_ii
+            + (1 - alpha) ** 2 * self.d_tt
+            + 2 * alpha * (1 - alpha) * self.c_it
         )
+        # Clip round-off below zero
+        return np.maximum(sq_dist, 0.0)
 
-    return accuracy_mean, accuracy_std
+
+@traced()
+def evaluate_svm_precomputed(
+    pair,
+    alphas: Sequence[float],
+    cv: int = 5,
+    random_state: int = 42,
+    distances: PairDistances = None,
+) -> List[Tuple[float, float, float]]:
+    """
+    Evaluate an RBF SVM on a ModalityPair for every alpha using precomputed kernels.
+    Gram blocks are computed once per pair; each alpha only reweights them.
+    gamma follows SVC's default gamma="scale", computed on each training fold.
+    Returns (alpha, accuracy_mean, accuracy_std) for every alpha.
+    """
+    distances = distances or PairDistances(pair)
+    labels = pair.labels
+    splits = fold_splits(labels, cv, random_state)
+    n_features = pair.image.shape[1]
+
+    results = []
+    for alpha in alphas:
+        sq_dist = distances.squared_distances(alpha)
+        fused = pair.fuse(alpha)
+
+        fold_accuracies = []
+        for train_idx, test_idx in splits:
+            gamma = 1.0 / (n_features * fused[train_idx].astype(np.float64).var())
+            kernel_train = np.exp(-gamma * sq_dist[np.ix_(train_idx, train_idx)])
+            kernel_test = np.exp(-gamma * sq_dist[np.ix_(test_idx, train_idx)])
+
+            clf = SVC(kernel="precomputed")
+            clf.fit(kernel_train, labels[train_idx])
+            preds = clf.predict(kernel_test)
+            fold_accuracies.append(np.mean(preds == labels[test_idx]))
+
+        fold_accuracies = np.array(fold_accuracies)
+        results.append(
+            (alpha, float(fold_accuracies.mean()), float(fold_accuracies.std()))
+        )
+    return results
@@ -1,18 +1,23 @@
 import os
+import json
 
-base_dir = "vector_store"
+base_dir = "vector_store/packed"
 subdirs = [
-    "image_embeddings/high_info",
-    "image_embeddings/low_info/dropout_50",
-    "text_embeddings/high_info",
-    "text_embeddings/low_info",
+    "image/high_info",
+    "image/low_info/dropout_50",
+    "text/high_info",
+    "text/low_info",
 ]
 
 expected_count = 1000
 
 
 def count_embeddings(path):
-    return len([f for f in os.listdir(path) if f.endswith(".npy")])
+    index_path = os.path.join(path, "index.json")
+    if not os.path.isfile(index_path):
+        return 0
+    with open(index_path, "r") as f:
+        return len(json.load(f)["ids"])
 
 
 def main():
@@ -1,7 +1,15 @@
 import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 
+# Allow file importing from parent directory
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+)
+
+from experiments.result_store import RESULTS_DB, read_results
+
 # CSV file containing columns:
 #   [dropout_level, representation, alpha, accuracy_mean, accuracy_std]
 RESULTS_CSV = "experiments/exp_0001/results/data/combined/multi_dropout_results.csv"
@@ -21,13 +29,12 @@ REP_LABELS = {
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    if not os.path.isfile(RESULTS_CSV):
-        print(f"Error: {RESULTS_CSV} does not exist.")
+    # 1) Read the results (result store, or the CSV)
+    df = read_results("exp_0001", RESULTS_CSV)
+    if df is None:
+        print(f"Error: no exp_0001 results in {RESULTS_DB} or {RESULTS_CSV}.")
         return
 
-    # 1) Read CSV
-    df = pd.read_csv(RESULTS_CSV)
-
     # Ensure correct dtypes
     df["alpha"] = df["alpha"].astype(float)
     df["accuracy_mean"] = df["accuracy_mean"].astype(float)
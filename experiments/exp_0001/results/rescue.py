@@ -1,8 +1,16 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+# Allow file importing from parent directory
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+)
+
+from experiments.result_store import RESULTS_DB, read_results
+
 # Paths
 RESULTS_CSV = "experiments/exp_0001/results/data/combined/multi_dropout_results.csv"
 OUTPUT_DIR = "experiments/exp_0001/results/images/rescue"
@@ -13,7 +21,10 @@ TARGET_REPS = ["LowImg-HighText", "HighImg-LowText"]
 
 
 def main():
-    df = pd.read_csv(RESULTS_CSV)
+    df = read_results("exp_0001", RESULTS_CSV)
+    if df is None:
+        print(f"Error: no exp_0001 results in {RESULTS_DB} or {RESULTS_CSV}.")
+        return
     for col in ["alpha", "accuracy_mean", "accuracy_std"]:
         df[col] = df[col].astype(float)
 
@@ -2,7 +2,8 @@
 Compare and visualize results from two experiments (Exp1: Logistic Regression, Exp2: SVM).
 
 Steps:
-1) Loads CSV data for both experiments.
+1) Loads the results of both experiments from the result store
+   (experiments/result_store.py), falling back to their CSVs.
 2) Merges them into a single DataFrame with a 'classifier' column.
 3) For each 'representation' (e.g., LowImg-HighText), plots Accuracy vs. Alpha
    with two lines (Logistic Regression vs. SVM).
@@ -14,10 +15,18 @@ Usage:
 """
 
 import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+# Allow file importing from parent directory
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+)
+
+from experiments.result_store import RESULTS_DB, read_results
+
 LOGREG_RESULTS = "experiments/exp_0002/log_reg/results/data/combined/results.csv"
 SVM_RESULTS = "experiments/exp_0002/svm/results/data/combined/results.csv"
 OUTPUT_DIR = "experiments/exp_0002/compare/images/"
@@ -35,8 +44,11 @@ REP_LABELS = {
 }
 
 
-def load_results(path, classifier_name):
-    df = pd.read_csv(path)
+def load_results(experiment, path, classifier_name):
+    df = read_results(experiment, path)
+    if df is None:
+        print(f"Error: no {experiment} results in {RESULTS_DB} or {path}.")
+        return None
     df["classifier"] = classifier_name
     df["alpha"] = df["alpha"].astype(float)
     df["accuracy_mean"] = df["accuracy_mean"].astype(float)
@@ -173,15 +185,10 @@ def print_clean_summary(df):
 
 
 def main():
-    if not os.path.isfile(LOGREG_RESULTS):
-        print(f"Error: {LOGREG_RESULTS} does not exist.")
+    df_logreg = load_results("exp_0002_log_reg", LOGREG_RESULTS, "logistic_regression")
+    df_svm = load_results("exp_0002_svm", SVM_RESULTS, "svm")
+    if df_logreg is None or df_svm is None:
         return
-    if not os.path.isfile(SVM_RESULTS):
-        print(f"Error: {SVM_RESULTS} does not exist.")
-        return
-
-    df_logreg = load_results(LOGREG_RESULTS, "logistic_regression")
-    df_svm = load_results(SVM_RESULTS, "svm")
 
     # Merge into one DataFrame
     df = pd.concat([df_logreg, df_svm], ignore_index=True)
@@ -13,10 +13,18 @@ Steps:
 """
 
 import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+# Allow file importing from parent directory
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from experiments.result_store import RESULTS_DB, read_results
+
 COMBINED_RESULTS_CSV = "experiments/exp_0001/results/data/combined/results.csv"
 OUTPUT_PLOT = "experiments/exp_0001/results/images/combined/accuracy_vs_alpha.png"
 OUTPUT_BEST_CSV = "experiments/exp_0001/results/data/combined/best_alpha_summary.csv"
@@ -35,12 +43,11 @@ REP_LABELS = {
 
 
 def main():
-    # 1. Read CSV
-    if not os.path.isfile(COMBINED_RESULTS_CSV):
-        print(f"Error: {COMBINED_RESULTS_CSV} does not exist.")
+    # 1. Read the results (result store, or the CSV)
+    df = read_results("exp_0002_log_reg", COMBINED_RESULTS_CSV)
+    if df is None:
+        print(f"Error: no exp_0002_log_reg results in {RESULTS_DB} or {COMBINED_RESULTS_CSV}.")
         return
-
-    df = pd.read_csv(COMBINED_RESULTS_CSV)
     df["alpha"] = df["alpha"].astype(float)
     df["accuracy_mean"] = df["accuracy_mean"].astype(float)
     df["accuracy_std"] = df["accuracy_std"].astype(float)
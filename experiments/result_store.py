@@ -0,0 +1,247 @@
+"""
+Persistent store of cross-validation results, shared by every experiment run.
+
+One SQLite database (experiments/results.db) holds
+
+    results      one row per evaluated cell, keyed by
+                 (image fingerprint, text fingerprint, run_key, alpha)
+    experiments  which cells make up each experiment's latest run, with the
+                 dropout_level / representation labels its CSV uses
+    fingerprints cached content fingerprints of the packed embedding sets
+
+A set's fingerprint is the sha256 of its vectors.npy and index.json, so a cell is
+only reused while the embeddings it was computed from are byte-identical; re-embedding
+one dropout level invalidates exactly the cells that use it. The run_key carries the
+classifier, alpha search, CV folds, seed and alpha grid (see run_experiment.py).
+
+The scheduler consults the store before fitting anything, so unchanged cells come
+back without being re-evaluated. The results scripts read an experiment's latest rows
+with read_results(), which falls back to the experiment's CSV if it is not in the store.
+"""
+
+import os
+import sqlite3
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from experiments.scheduler import COLUMNS, alpha_key
+from preprocessing.vectorize.vector_store import (
+    INDEX_FILE,
+    PACKED_ROOT,
+    VECTORS_FILE,
+    is_packed_set,
+    resolve_set_dir,
+)
+
+RESULTS_DB = "experiments/results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    image_fingerprint TEXT NOT NULL,
+    text_fingerprint TEXT NOT NULL,
+    run_key TEXT NOT NULL,
+    alpha_key TEXT NOT NULL,
+    alpha REAL NOT NULL,
+    accuracy_mean REAL NOT NULL,
+    accuracy_std REAL NOT NULL,
+    image_set TEXT NOT NULL,
+    text_set TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (image_fingerprint, text_fingerprint, run_key, alpha_key)
+);
+CREATE TABLE IF NOT EXISTS experiments (
+    experiment TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    dropout_level TEXT NOT NULL,
+    representation TEXT NOT NULL,
+    run_key TEXT NOT NULL,
+    image_set TEXT NOT NULL,
+    text_set TEXT NOT NULL,
+    image_fingerprint TEXT NOT NULL,
+    text_fingerprint TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (experiment, position)
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    set_dir TEXT PRIMARY KEY,
+    stat TEXT NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class ResultStore:
+    def __init__(self, path: str = RESULTS_DB, root=PACKED_ROOT):
+        self.path = path
+        self.root = root
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._fingerprints = {}
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fingerprint(self, set_name: str) -> Optional[str]:
+        """Content fingerprint of a packed set, or None if the set is missing."""
+        if set_name in self._fingerprints:
+            return self._fingerprints[set_name]
+        set_dir = resolve_set_dir(set_name, self.root)
+        if not is_packed_set(set_dir):
+            return None
+
+        files = [set_dir / VECTORS_FILE, set_dir / INDEX_FILE]
+        stats = [os.stat(path) for path in files]
+        stat = ";".join(f"{s.st_size}:{s.st_mtime_ns}" for s in stats)
+        row = self.db.execute(
+            "SELECT stat, fingerprint FROM fingerprints WHERE set_dir = ?",
+            (str(set_dir.resolve()),),
+        ).fetchone()
+        if row and row[0] == stat:
+            fingerprint = row[1]
+        else:
+            digest = hashlib.sha256()
+            for path in files:
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(chunk)
+            fingerprint = digest.hexdigest()
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)",
+                    (str(set_dir.resolve()), stat, fingerprint),
+                )
+        self._fingerprints[set_name] = fingerprint
+        return fingerprint
+
+    def cell_fingerprints(self, image_set: str, text_set: str):
+        """(image, text) fingerprints, or None if either set is missing."""
+        image_fp, text_fp = self.fingerprint(image_set), self.fingerprint(text_set)
+        if image_fp is None or text_fp is None:
+            return None
+        return image_fp, text_fp
+
+    def get(
+        self, run_key: str, image_set: str, text_set: str
+    ) -> Dict[str, Tuple[float, float, float]]:
+        """Stored {alpha_key: (alpha, mean, std)} for one (run_key, pair) cell."""
+        fingerprints = self.cell_fingerprints(image_set, text_set)
+        if fingerprints is None:
+            return {}
+        rows = self.db.execute(
+            "SELECT alpha_key, alpha, accuracy_mean, accuracy_std FROM results "
+            "WHERE image_fingerprint = ? AND text_fingerprint = ? AND run_key = ?",
+            (*fingerprints, run_key),
+        )
+        return {key: (alpha, mean, std) for key, alpha, mean, std in rows}
+
+    def put(
+        self,
+        run_key: str,
+        image_set: str,
+        text_set: str,
+        results: Sequence[Tuple[float, float, float]],
+    ):
+        """
+        Store the results of one evaluation of a (run_key, pair) cell, replacing
+        whatever was stored for it, so a cell never mixes results of two runs.
+        """
+        fingerprints = self.cell_fingerprints(image_set, text_set)
+        if fingerprints is None:
+            return
+        created_at = _now()
+        with self.db:
+            self.db.execute(
+                "DELETE FROM results "
+                "WHERE image_fingerprint = ? AND text_fingerprint = ? AND run_key = ?",
+                (*fingerprints, run_key),
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        *fingerprints,
+                        run_key,
+                        alpha_key(alpha),
+                        alpha,
+                        mean,
+                        std,
+                        image_set,
+                        text_set,
+                        created_at,
+                    )
+                    for alpha, mean, std in results
+                ],
+            )
+
+    def record_experiment(self, experiment: str, blocks: Sequence[tuple], run_key: str):
+        """Make 'blocks' (see scheduler.plan_blocks) the experiment's latest run."""
+        updated_at = _now()
+        entries = []
+        for position, (dropout_level, representation, image_set, text_set) in enumerate(
+            blocks
+        ):
+            fingerprints = self.cell_fingerprints(image_set, text_set)
+            if fingerprints is None:
+                continue
+            entries.append(
+                (
+                    experiment,
+                    position,
+                    dropout_level,
+                    representation,
+                    run_key,
+                    image_set,
+                    text_set,
+                    *fingerprints,
+                    updated_at,
+                )
+            )
+        with self.db:
+            self.db.execute("DELETE FROM experiments WHERE experiment = ?", (experiment,))
+            self.db.executemany(
+                "INSERT INTO experiments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", entries
+            )
+
+    def experiment_rows(self, experiment: str) -> List[list]:
+        """
+        Latest rows [dropout_level, representation, alpha, accuracy_mean, accuracy_std]
+        of an experiment, in block and alpha order.
+        """
+        rows = self.db.execute(
+            "SELECT e.dropout_level, e.representation, r.alpha, r.accuracy_mean, "
+            "r.accuracy_std FROM experiments e JOIN results r "
+            "ON r.image_fingerprint = e.image_fingerprint "
+            "AND r.text_fingerprint = e.text_fingerprint AND r.run_key = e.run_key "
+            "WHERE e.experiment = ? ORDER BY e.position, r.alpha",
+            (experiment,),
+        )
+        return [list(row) for row in rows]
+
+
+def read_results(experiment: str, csv_path: str = None, db_path: str = RESULTS_DB):
+    """
+    DataFrame with the latest results of 'experiment' from the result store, or
+    from 'csv_path' if the store has none. Returns None if neither exists.
+    """
+    import pandas as pd
+
+    if os.path.isfile(db_path):
+        with ResultStore(db_path) as store:
+            rows = store.experiment_rows(experiment)
+        if rows:
+            return pd.DataFrame(rows, columns=COLUMNS)
+    if csv_path and os.path.isfile(csv_path):
+        return pd.read_csv(csv_path)
+    return None
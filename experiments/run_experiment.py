@@ -0,0 +1,264 @@
+"""
+Run one or more experiments from declarative specs (TOML or YAML).
+
+A spec lists everything that used to be hard-coded in each classify_combined.py:
+
+    name = "exp_0002_svm"
+    classifier = "svm_rbf"               # or "logistic_regression", "knn"
+    output = "experiments/exp_0002/results/data/combined/results.csv"
+    columns = ["representation", "alpha", "accuracy_mean", "accuracy_std"]  # optional
+    dropout_levels = [50]
+    alphas = [0.0, 0.25, 0.5, 0.75, 1.0]
+    alpha_search = "grid"                # or "refine" (logistic regression only)
+    neighbors = 15                       # optional, knn only
+
+    [cv]
+    folds = 5
+    random_state = 42
+
+    [[pairs]]
+    image = "low_info"
+    text = "high_info"
+    name = "LowImg-HighText"
+
+The specs given on one command line are executed together through the scheduler
+(experiments/scheduler.py): embedding sets are memory-mapped from the packed vector
+store and kept loaded per worker, and a cell that several experiments (or several
+dropout levels of one experiment) share is evaluated only once. Cells already in
+the result store (experiments/result_store.py) from an earlier run on the same
+embeddings are not evaluated at all. Each experiment then gets its own CSV and is
+recorded in the store, where the results scripts read it from.
+
+TOML specs are read with tomllib, or on Python < 3.11 with the tomli package
+(pip install tomli); YAML specs need PyYAML.
+
+Usage:
+    python experiments/run_experiment.py experiments/configs/exp_0001.toml
+    python experiments/run_experiment.py experiments/configs/*.toml
+"""
+
+import os
+import sys
+import argparse
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, List, Sequence, Tuple
+
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classifiers.alpha_sweep import refine_alphas, sweep_alphas
+from classifiers.knn import K_NEIGHBORS, evaluate_knn
+from classifiers.svm import evaluate_svm_precomputed
+from experiments.result_store import RESULTS_DB, ResultStore
+from experiments.scheduler import (
+    COLUMNS,
+    block_rows,
+    evaluate_cells,
+    plan_blocks,
+    write_results,
+)
+from instrumentation.tracing import traced
+
+CONFIG_DIR = "experiments/configs"
+
+CLASSIFIERS = ("logistic_regression", "svm_rbf", "knn")
+ALPHA_SEARCHES = ("grid", "refine")
+
+
+@dataclass
+class ExperimentSpec:
+    name: str
+    classifier: str
+    output: str
+    dropout_levels: List[int]
+    # (image_level, text_level, display_name)
+    pairs: List[Tuple[str, str, str]]
+    alphas: List[float]
+    alpha_search: str = "grid"
+    cv: int = 5
+    random_state: int = 42
+    neighbors: int = K_NEIGHBORS
+    columns: List[str] = field(default_factory=lambda: list(COLUMNS))
+
+    def validate(self):
+        if self.classifier not in CLASSIFIERS:
+            raise ValueError(
+                f"{self.name}: unknown classifier {self.classifier!r} "
+                f"(expected one of {', '.join(CLASSIFIERS)})"
+            )
+        if self.alpha_search not in ALPHA_SEARCHES:
+            raise ValueError(
+                f"{self.name}: unknown alpha_search {self.alpha_search!r} "
+                f"(expected one of {', '.join(ALPHA_SEARCHES)})"
+            )
+        if self.alpha_search == "refine" and self.classifier != "logistic_regression":
+            raise ValueError(f"{self.name}: alpha_search 'refine' needs logistic_regression")
+        unknown = [column for column in self.columns if column not in COLUMNS]
+        if unknown:
+            raise ValueError(f"{self.name}: unknown columns {unknown}")
+        if not self.pairs or not self.dropout_levels or not self.alphas:
+            raise ValueError(f"{self.name}: pairs, dropout_levels and alphas must be set")
+
+    @property
+    def run_key(self) -> str:
+        """Everything that determines a cell's result besides its embedding sets."""
+        alphas = ",".join(f"{alpha:g}" for alpha in sorted(self.alphas))
+        classifier = self.classifier
+        if classifier == "knn":
+            classifier += f"/k{self.neighbors}"
+        return (
+            f"{classifier}/{self.alpha_search}/cv{self.cv}"
+            f"/seed{self.random_state}/alphas={alphas}"
+        )
+
+    def evaluator(self) -> Callable:
+        """Picklable evaluate(pair, alphas) callable for the scheduler."""
+        if self.classifier == "svm_rbf":
+            return partial(
+                evaluate_svm_precomputed, cv=self.cv, random_state=self.random_state
+            )
+        if self.classifier == "knn":
+            return partial(
+                evaluate_knn, cv=self.cv, random_state=self.random_state, k=self.neighbors
+            )
+        if self.alpha_search == "refine":
+            return partial(refine_alphas, cv=self.cv, random_state=self.random_state)
+        # Parallelism comes from the scheduler, so each block sweeps in a single process
+        return partial(
+            sweep_alphas, cv=self.cv, random_state=self.random_state, n_jobs=1
+        )
+
+    def blocks(self) -> List[tuple]:
+        return plan_blocks(self.dropout_levels, self.pairs)
+
+
+def read_spec_file(path: str) -> dict:
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ModuleNotFoundError:  # Python < 3.11: the tomli backport
+            import tomli as tomllib
+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if path.endswith((".yaml", ".yml")):
+        import yaml
+
+        with open(path, "r") as f:
+            return yaml.safe_load(f)
+    raise ValueError(f"Unsupported spec format: {path} (use .toml, .yaml or .yml)")
+
+
+def load_spec(path: str) -> ExperimentSpec:
+    """Read and validate an experiment spec."""
+    data = read_spec_file(path)
+    cv = data.get("cv", {})
+    try:
+        spec = ExperimentSpec(
+            name=data.get("name", os.path.splitext(os.path.basename(path))[0]),
+            classifier=data["classifier"],
+            output=data["output"],
+            dropout_levels=[int(level) for level in data["dropout_levels"]],
+            pairs=[(p["image"], p["text"], p["name"]) for p in data["pairs"]],
+            alphas=[float(alpha) for alpha in data["alphas"]],
+            alpha_search=data.get("alpha_search", "grid"),
+            cv=int(cv.get("folds", 5)),
+            random_state=int(cv.get("random_state", 42)),
+            neighbors=int(data.get("neighbors", K_NEIGHBORS)),
+            columns=list(data.get("columns", COLUMNS)),
+        )
+    except KeyError as e:
+        raise ValueError(f"{path}: missing required field {e}") from None
+    spec.validate()
+    return spec
+
+
+def _journal_path(specs: Sequence[ExperimentSpec]) -> str:
+    if len(specs) == 1:
+        return f"{specs[0].output}.partial.jsonl"
+    names = "+".join(sorted(spec.name for spec in specs))
+    return os.path.join("experiments", f".{names}.partial.jsonl")
+
+
+@traced()
+def run_experiments(
+    specs: Sequence[ExperimentSpec],
+    max_workers: int = None,
+    resume: bool = True,
+    db_path: str = RESULTS_DB,
+) -> dict:
+    """
+    Evaluate the union of all specs' cells once, reusing the cells stored in the
+    result store at 'db_path' (None disables it), then write every spec's CSV.
+    Returns {spec name: rows}.
+    """
+    jobs = {}
+    n_cells = 0
+    for spec in specs:
+        blocks = spec.blocks()
+        n_cells += len(blocks) * len(spec.alphas)
+        evaluate, alphas, set_pairs = jobs.setdefault(
+            spec.run_key, (spec.evaluator(), spec.alphas, [])
+        )
+        set_pairs.extend((image_set, text_set) for _, _, image_set, text_set in blocks)
+
+    n_unique = sum(
+        len(set(set_pairs)) * len(alphas) for _, alphas, set_pairs in jobs.values()
+    )
+    print(
+        f"{len(specs)} experiment(s): {n_cells} cells, {n_unique} unique "
+        f"({n_cells - n_unique} shared)"
+    )
+
+    store = ResultStore(db_path) if db_path else None
+    try:
+        journal_path = _journal_path(specs)
+        results = evaluate_cells(jobs, journal_path, max_workers, resume, store)
+
+        all_rows = {}
+        for spec in specs:
+            blocks = spec.blocks()
+            rows = block_rows(blocks, spec.run_key, results)
+            write_results(rows, spec.output, spec.columns)
+            if store is not None:
+                store.record_experiment(spec.name, blocks, spec.run_key)
+            all_rows[spec.name] = rows
+            print(f"✓ {spec.name}: {len(rows)} rows written to {spec.output}")
+        os.remove(journal_path)
+    finally:
+        if store is not None:
+            store.close()
+    return all_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("configs", nargs="+", help="experiment spec files (.toml/.yaml)")
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="ignore the journal of an interrupted run and start over",
+    )
+    parser.add_argument(
+        "--no-store",
+        action="store_true",
+        help=f"neither reuse nor record results in {RESULTS_DB}",
+    )
+    args = parser.parse_args(argv)
+
+    specs = [load_spec(path) for path in args.configs]
+    names = [spec.name for spec in specs]
+    if len(set(names)) != len(names):
+        sys.exit(f"Experiment names must be unique: {names}")
+    run_experiments(
+        specs,
+        args.max_workers,
+        resume=not args.no_resume,
+        db_path=None if args.no_store else RESULTS_DB,
+    )
+
+
+if __name__ == "__main__":
+    main()
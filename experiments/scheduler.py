@@ -0,0 +1,264 @@
+"""
+Parallel scheduler for the dropout × pair × alpha experiment grid.
+
+The grid is split into blocks, one per (dropout_level, representation), each
+covering every alpha of the grid (so warm starts and Gram reuse inside an
+evaluator still apply). Blocks are fanned out over a process pool.
+Workers open the packed embedding sets as read-only memory maps, so every process
+shares the same pages instead of receiving pickled copies of the matrices, and
+each worker keeps the pairs it has loaded for the blocks that follow.
+
+Cells are identified by what they compute, (run_key, image_set, text_set, alpha),
+not by their display labels. Blocks that resolve to the same embedding sets (e.g.
+HighImg-HighText at every dropout level, or the same pair in two experiments run
+together, see run_experiment.py) are evaluated once and their results shared.
+
+Given a ResultStore (experiments/result_store.py), cells already stored for the same
+embedding content and classifier configuration are reused instead of evaluated,
+and every newly finished block is stored.
+
+Results are collected in memory and written to the output CSV in one atomic write.
+While the run is in progress, each finished cell is appended to a small journal
+next to the CSV (<csv>.partial.jsonl); an interrupted run resumes from it and only
+evaluates the missing cells. A cell with only some of its alphas finished is
+evaluated over the full grid again, since warm-start chains and refine_alphas
+depend on every alpha, and its results replace the partial ones.
+"""
+
+import os
+import csv
+import json
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from instrumentation.tracing import stage, traced
+from preprocessing.combine.fusion import ModalityPair
+from preprocessing.vectorize.vector_store import image_set_name, text_set_name
+
+COLUMNS = ["dropout_level", "representation", "alpha", "accuracy_mean", "accuracy_std"]
+
+# Pairs a worker keeps loaded (memory maps, so each costs little resident memory)
+PAIR_CACHE_SIZE = 16
+
+
+def plan_blocks(dropout_levels: Sequence[int], pairs) -> List[tuple]:
+    """
+    Return (dropout_level, representation, image_set, text_set) blocks for
+    every dropout level and (image_level, text_level, display_name) pair.
+    """
+    blocks = []
+    for level in dropout_levels:
+        for image_level, text_level, display_name in pairs:
+            blocks.append(
+                (
+                    f"dropout_{level}",
+                    display_name,
+                    image_set_name(image_level, level),
+                    text_set_name(text_level),
+                )
+            )
+    return blocks
+
+
+def alpha_key(alpha: float) -> str:
+    return f"{alpha:.4f}"
+
+
+@lru_cache(maxsize=PAIR_CACHE_SIZE)
+@traced()
+def load_pair(image_set: str, text_set: str) -> ModalityPair:
+    """ModalityPair for two packed sets, cached per process."""
+    return ModalityPair(image_set, text_set)
+
+
+def _run_block(evaluate, image_set, text_set, alphas):
+    # Runs in a worker: the pair memory-maps the packed sets
+    with stage("block", image_set=image_set, text_set=text_set) as s:
+        results = evaluate(load_pair(image_set, text_set), alphas)
+        s.items = len(results)
+    return results
+
+
+def _load_journal(journal_path: str, run_keys) -> dict:
+    finished = {}
+    if not os.path.isfile(journal_path):
+        return finished
+    with open(journal_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line from an interrupted write
+            if record.get("run_key") not in run_keys or "alpha" not in record:
+                continue  # Other configuration, or an older journal format
+            cell = (record["run_key"], record["image_set"], record["text_set"])
+            alpha = record["alpha"]
+            finished.setdefault(cell, {})[alpha_key(alpha)] = (
+                alpha,
+                record["mean"],
+                record["std"],
+            )
+    return finished
+
+
+def _format_alpha(alpha: float) -> str:
+    # Grid alphas keep two decimals (0.25); refined ones up to four (0.4106)
+    whole, _, decimals = f"{alpha:.4f}".partition(".")
+    return f"{whole}.{decimals.rstrip('0').ljust(2, '0')}"
+
+
+@traced()
+def evaluate_cells(
+    jobs: Dict[str, tuple],
+    journal_path: str,
+    max_workers: int = None,
+    resume: bool = True,
+    store=None,
+) -> Dict[tuple, List[Tuple[float, float, float]]]:
+    """
+    Evaluate a set of grids over one shared process pool.
+
+    'jobs' maps a run_key to (evaluate, alphas, set_pairs), where set_pairs lists
+    (image_set, text_set) tuples; duplicates are evaluated once. 'evaluate(pair,
+    alphas)' must be a picklable callable returning (alpha, accuracy_mean,
+    accuracy_std) per alpha; it may return extra alphas (e.g. refine_alphas), which
+    are kept too. 'run_key' identifies the classifier configuration, so cells of
+    different configurations are never mixed up, in the journal or in the results.
+    With a 'store', cells found there are not evaluated again.
+
+    Returns {(run_key, image_set, text_set): [(alpha, mean, std), ...]} sorted by
+    alpha. The journal is left in place; remove it once the results are saved.
+    """
+    finished = _load_journal(journal_path, jobs) if resume else {}
+    n_finished = sum(len(cells) for cells in finished.values())
+    if n_finished:
+        print(f"Resuming: {n_finished} cells already finished in {journal_path}")
+
+    if store is not None:
+        n_stored = 0
+        for run_key, (_, _, set_pairs) in jobs.items():
+            for image_set, text_set in dict.fromkeys(set_pairs):
+                stored = store.get(run_key, image_set, text_set)
+                if stored:
+                    n_stored += len(stored)
+                    cell = (run_key, image_set, text_set)
+                    finished[cell] = {**stored, **finished.get(cell, {})}
+        if n_stored:
+            print(f"Reusing {n_stored} stored cells from {store.path}")
+
+    os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+    with open(journal_path, "a" if resume else "w") as journal:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {}
+            for run_key, (evaluate, alphas, set_pairs) in jobs.items():
+                for image_set, text_set in dict.fromkeys(set_pairs):
+                    cell = (run_key, image_set, text_set)
+                    done = finished.get(cell, {})
+                    if all(alpha_key(a) in done for a in alphas):
+                        continue
+                    future = pool.submit(
+                        _run_block, evaluate, image_set, text_set, list(alphas)
+                    )
+                    futures[future] = cell
+
+            for future in as_completed(futures):
+                run_key, image_set, text_set = cell = futures[future]
+                try:
+                    results = future.result()
+                except FileNotFoundError as e:
+                    print(f"  [Skip] {e}")
+                    continue
+
+                if store is not None:
+                    store.put(run_key, image_set, text_set, results)
+                # The whole grid was evaluated, so partial results are dropped
+                finished[cell] = {}
+                for alpha, mean, std in results:
+                    finished.setdefault(cell, {})[alpha_key(alpha)] = (alpha, mean, std)
+                    record = {
+                        "run_key": run_key,
+                        "image_set": image_set,
+                        "text_set": text_set,
+                        "alpha": alpha,
+                        "mean": mean,
+                        "std": std,
+                    }
+                    journal.write(json.dumps(record) + "\n")
+                    print(
+                        f"  [{run_key.split('/')[0]}: {image_set} + {text_set}, "
+                        f"alpha={_format_alpha(alpha)}] "
+                        f"Accuracy: {mean:.3f} ± {std:.3f}"
+                    )
+                journal.flush()
+
+    return {
+        cell: sorted(cells.values(), key=lambda result: result[0])
+        for cell, cells in finished.items()
+    }
+
+
+def block_rows(blocks: Sequence[tuple], run_key: str, results: dict) -> List[list]:
+    """
+    Rows [dropout_level, representation, alpha, accuracy_mean, accuracy_std] for
+    'blocks', in block and alpha order, from evaluate_cells() results.
+    """
+    rows = []
+    for dropout_level, representation, image_set, text_set in blocks:
+        for alpha, mean, std in results.get((run_key, image_set, text_set), []):
+            rows.append([dropout_level, representation, alpha, mean, std])
+    return rows
+
+
+@traced()
+def write_results(rows, csv_path: str, columns: Sequence[str] = COLUMNS):
+    """Write result rows to 'csv_path' atomically, keeping only 'columns'."""
+    formats = {
+        "dropout_level": str,
+        "representation": str,
+        "alpha": _format_alpha,
+        "accuracy_mean": lambda value: f"{value:.3f}",
+        "accuracy_std": lambda value: f"{value:.3f}",
+    }
+    positions = [COLUMNS.index(column) for column in columns]
+
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    tmp_path = f"{csv_path}.tmp"
+    with open(tmp_path, mode="w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([formats[COLUMNS[p]](row[p]) for p in positions])
+    os.replace(tmp_path, csv_path)
+
+
+def run_grid(
+    blocks: Sequence[tuple],
+    alphas: Sequence[float],
+    evaluate: Callable,
+    csv_path: str,
+    run_key: str,
+    columns: Sequence[str] = COLUMNS,
+    max_workers: int = None,
+    resume: bool = True,
+    store=None,
+) -> List[list]:
+    """
+    Evaluate every (block, alpha) cell and write the results to 'csv_path'.
+    See evaluate_cells() for 'evaluate', 'run_key' and 'store'.
+    Returns rows [dropout_level, representation, alpha, accuracy_mean, accuracy_std]
+    in block and alpha order.
+    """
+    journal_path = f"{csv_path}.partial.jsonl"
+    set_pairs = [(image_set, text_set) for _, _, image_set, text_set in blocks]
+    results = evaluate_cells(
+        {run_key: (evaluate, alphas, set_pairs)},
+        journal_path,
+        max_workers,
+        resume,
+        store,
+    )
+    rows = block_rows(blocks, run_key, results)
+    write_results(rows, csv_path, columns)
+    os.remove(journal_path)
+    return rows
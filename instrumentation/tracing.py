@@ -0,0 +1,285 @@
+"""
+Opt-in stage tracing and profiling for the pipeline scripts.
+
+Code marks its stages with
+
+    with stage("embed_directory", set=set_name) as s:
+        ...
+        s.items = n_embedded
+
+or decorates a function with @traced(). Tracing is off unless PIPELINE_TRACE names
+an output file; then every stage records wall time, CPU time, items processed (and
+items/sec), bytes read/written (/proc/self/io: rchar/wchar, Linux only), RSS at its
+end and the process's peak RSS so far. When disabled a stage costs one attribute
+check, so stages are placed around batches and whole steps, never inner loops.
+
+Stages from every process (e.g. the scheduler's worker pool, which inherits the
+environment) are appended to <trace>.events.jsonl as they finish. When the process
+that enabled tracing exits, they are collected into a Chrome trace JSON at
+PIPELINE_TRACE (open in chrome://tracing or https://ui.perfetto.dev) and a per-stage
+summary is printed. With PIPELINE_PROFILE set, that process also runs under
+cProfile and writes its stats there (inspect with `python -m pstats`).
+
+Any script can be traced without editing it:
+
+    python instrumentation/tracing.py --trace trace.json --profile run.prof \\
+        preprocessing/vectorize/create_embeddings.py --num-workers 0
+
+which is the same as setting PIPELINE_TRACE / PIPELINE_PROFILE for that command.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import runpy
+import argparse
+import threading
+import functools
+from collections import defaultdict
+
+TRACE_ENV = "PIPELINE_TRACE"
+PROFILE_ENV = "PIPELINE_PROFILE"
+# pid of the process that collects the trace; set once, inherited by child processes
+OWNER_ENV = "PIPELINE_TRACE_OWNER"
+
+_trace_path = None
+_events_path = None
+_profiler = None
+_lock = threading.Lock()
+
+
+def _read_proc(path: str, keys) -> dict:
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in keys:
+                    values[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def _io_bytes():
+    io = _read_proc("/proc/self/io", ("rchar", "wchar"))
+    return io.get("rchar"), io.get("wchar")
+
+
+def _memory_mb():
+    status = _read_proc("/proc/self/status", ("VmRSS", "VmHWM"))
+    rss, peak = status.get("VmRSS"), status.get("VmHWM")
+    return (
+        None if rss is None else round(rss / 1024, 1),
+        None if peak is None else round(peak / 1024, 1),
+    )
+
+
+def enabled() -> bool:
+    return _events_path is not None
+
+
+class Stage:
+    """A running stage; set 'items' (or add to it) to get items/sec."""
+
+    __slots__ = ("name", "args", "items", "_start", "_cpu", "_io", "_ts")
+
+    def __init__(self, name: str, args: dict, items: int = None):
+        self.name = name
+        self.args = args
+        self.items = items
+
+    def __enter__(self):
+        if _events_path is not None:
+            self._io = _io_bytes()
+            self._ts = time.time_ns() // 1000
+            self._cpu = time.process_time()
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if _events_path is None:
+            return False
+        duration = time.perf_counter() - self._start
+        cpu = time.process_time() - self._cpu
+        read_end, written_end = _io_bytes()
+        rss, peak_rss = _memory_mb()
+
+        args = dict(self.args)
+        args.update(wall_ms=round(1000 * duration, 3), cpu_ms=round(1000 * cpu, 3))
+        if self.items is not None:
+            args["items"] = self.items
+            if duration > 0:
+                args["items_per_sec"] = round(self.items / duration, 3)
+        if read_end is not None and self._io[0] is not None:
+            args["bytes_read"] = read_end - self._io[0]
+            args["bytes_written"] = written_end - self._io[1]
+        args.update(rss_mb=rss, peak_rss_mb=peak_rss)
+        if exc_type is not None:
+            args["error"] = exc_type.__name__
+
+        event = {
+            "name": self.name,
+            "cat": "stage",
+            "ph": "X",
+            "ts": self._ts,
+            "dur": max(1, int(1e6 * duration)),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        _append(event)
+        return False
+
+
+def stage(name: str, items: int = None, **args) -> Stage:
+    """
+    Context manager that records one stage (no-op unless tracing is enabled);
+    keyword arguments are stored with the event.
+    """
+    return Stage(name, args, items)
+
+
+def traced(name: str = None):
+    """Decorator recording every call of a function as a stage."""
+
+    def decorate(func):
+        # File name rather than __module__, which is "__main__" for a script
+        module = os.path.splitext(os.path.basename(func.__code__.co_filename))[0]
+        stage_name = name or f"{module}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _events_path is None:
+                return func(*args, **kwargs)
+            with Stage(stage_name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _append(event: dict):
+    line = json.dumps(event, default=str) + "\n"
+    with _lock:
+        # One small O_APPEND write per event, so processes can share the file
+        fd = os.open(_events_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+def summarize(events) -> list:
+    """Per-stage totals: [name, calls, wall_ms, cpu_ms, items] sorted by wall time."""
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0])
+    for event in events:
+        total = totals[event["name"]]
+        total[0] += 1
+        total[1] += event["args"].get("wall_ms", 0.0)
+        total[2] += event["args"].get("cpu_ms", 0.0)
+        total[3] += event["args"].get("items") or 0
+    rows = [[name, *total] for name, total in totals.items()]
+    return sorted(rows, key=lambda row: -row[2])
+
+
+def write_trace():
+    """Collect every process's events into the Chrome trace and print a summary."""
+    if not os.path.isfile(_events_path):
+        return
+    events = []
+    with open(_events_path, "r") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Torn line from a killed worker
+
+    pids = sorted({event["pid"] for event in events})
+    owner = os.getpid()
+    metadata = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": "main" if pid == owner else f"worker {pid}"},
+        }
+        for pid in pids
+    ]
+    trace = {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+    tmp_path = f"{_trace_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(trace, f)
+    os.replace(tmp_path, _trace_path)
+    os.remove(_events_path)
+
+    print(f"\nTrace: {len(events)} stages from {len(pids)} process(es) -> {_trace_path}")
+    print(f"  {'stage':<36}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'items':>9}")
+    for name, calls, wall_ms, cpu_ms, items in summarize(events)[:15]:
+        print(
+            f"  {name:<36}{calls:>7}{wall_ms / 1000:>10.2f}{cpu_ms / 1000:>10.2f}"
+            f"{items or '':>9}"
+        )
+
+
+def _finish():
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(os.environ[PROFILE_ENV])
+        print(f"Profile -> {os.environ[PROFILE_ENV]}")
+    write_trace()
+
+
+def enable_from_env():
+    """Turn tracing on if PIPELINE_TRACE is set (runs once, at import)."""
+    global _trace_path, _events_path, _profiler
+    trace_path = os.environ.get(TRACE_ENV)
+    if not trace_path:
+        return
+    _trace_path = os.path.abspath(trace_path)
+    _events_path = f"{_trace_path}.events.jsonl"
+
+    if OWNER_ENV not in os.environ:
+        # First process to see the variable collects the trace; children only append
+        os.environ[OWNER_ENV] = str(os.getpid())
+        os.makedirs(os.path.dirname(_trace_path), exist_ok=True)
+        if os.path.isfile(_events_path):
+            os.remove(_events_path)  # Left over from a killed run
+        if os.environ.get(PROFILE_ENV):
+            import cProfile
+
+            _profiler = cProfile.Profile()
+            _profiler.enable()
+        atexit.register(_finish)
+
+
+enable_from_env()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a script with stage tracing (and optionally cProfile) enabled."
+    )
+    parser.add_argument("--trace", required=True, help="Chrome trace JSON to write")
+    parser.add_argument("--profile", help="cProfile stats file to write")
+    parser.add_argument("script", help="script to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="the script's arguments")
+    args = parser.parse_args()
+
+    os.environ[TRACE_ENV] = args.trace
+    if args.profile:
+        os.environ[PROFILE_ENV] = args.profile
+    if not enabled():
+        enable_from_env()
+
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    with stage(os.path.basename(args.script), argv=" ".join(args.args)):
+        runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+On-the-fly fusion of image and text embedding sets.
+
+A ModalityPair loads one image set and one text set from the packed vector store,
+aligns them row-by-row on sample ID once, and can then produce
+
+    combined = alpha * image + (1 - alpha) * text
+
+for any alpha with a single vectorized operation (or for a whole alpha grid with
+one broadcast). A FusedView binds a pair to one alpha and only builds its matrix
+when the vectors are first accessed, so classifiers can take it in place of a
+materialized combined_embeddings/ folder.
+"""
+
+import numpy as np
+from typing import Sequence
+
+from preprocessing.vectorize.vector_store import (
+    PACKED_ROOT,
+    image_set_name,
+    label_from_id,
+    load_embedding_set,
+    text_set_name,
+)
+
+
+class ModalityPair:
+    """Image and text embedding sets aligned row-by-row on sample ID."""
+
+    def __init__(self, image_set: str, text_set: str, root=PACKED_ROOT):
+        self.image_set = image_set
+        self.text_set = text_set
+
+        img_vecs, _, img_ids = load_embedding_set(image_set, root)
+        txt_vecs, _, txt_ids = load_embedding_set(text_set, root)
+
+        # Keep image order; drop samples that have no text counterpart
+        txt_row = {sample_id: row for row, sample_id in enumerate(txt_ids)}
+        img_rows = [row for row, sample_id in enumerate(img_ids) if sample_id in txt_row]
+        self.ids = [img_ids[row] for row in img_rows]
+        self.missing = [sample_id for sample_id in img_ids if sample_id not in txt_row]
+
+        if img_ids == txt_ids:
+            # Already aligned: keep the read-only memory maps, no copy
+            self.image, self.text = img_vecs, txt_vecs
+        else:
+            # One gather per modality; afterwards both matrices share row order
+            self.image = np.asarray(img_vecs[img_rows], dtype=np.float32)
+            self.text = np.asarray(
+                txt_vecs[[txt_row[sample_id] for sample_id in self.ids]],
+                dtype=np.float32,
+            )
+        self.labels = np.array([label_from_id(i) for i in self.ids], dtype=np.int64)
+
+    @classmethod
+    def from_levels(
+        cls, image_level: str, text_level: str, dropout_level: int, root=PACKED_ROOT
+    ) -> "ModalityPair":
+        """Build a pair from info levels, e.g. ('low_info', 'high_info', 50)."""
+        return cls(
+            image_set_name(image_level, dropout_level), text_set_name(text_level), root
+        )
+
+    def fuse(self, alpha: float) -> np.ndarray:
+        """Return the (n_samples, dim) combined matrix for one alpha."""
+        return alpha * self.image + (1 - alpha) * self.text
+
+    def fuse_grid(self, alphas: Sequence[float]) -> np.ndarray:
+        """Return the (n_alphas, n_samples, dim) combined matrices for a whole alpha grid."""
+        weights = np.asarray(alphas, dtype=np.float32)[:, None, None]
+        return weights * self.image + (1 - weights) * self.text
+
+    def view(self, alpha: float) -> "FusedView":
+        return FusedView(self, alpha)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"ModalityPair({self.image_set!r}, {self.text_set!r}, n={len(self)})"
+
+
+class FusedView:
+    """Lazily fused embeddings of a ModalityPair at a fixed alpha."""
+
+    def __init__(self, pair: ModalityPair, alpha: float):
+        self.pair = pair
+        self.alpha = alpha
+        self._vectors = None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            self._vectors = self.pair.fuse(self.alpha)
+        return self._vectors
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.pair.labels
+
+    @property
+    def ids(self):
+        return self.pair.ids
+
+    def __repr__(self):
+        return (
+            f"FusedView({self.pair.image_set!r} + {self.pair.text_set!r}, "
+            f"alpha={self.alpha:.2f})"
+        )
@@ -0,0 +1,359 @@
+"""
+Generate descriptions through the OpenAI Batch API instead of one request per photo.
+
+Steps (each is a subcommand; 'run' does all of them in order):
+  prepare  write every pending photo's request (same INSTRUCTIONS and model as
+           generate_descriptions.py) into JSONL batch files under
+           sample_sets/descriptions/batches/, split to stay under the upload limits
+  submit   upload the batch files and create one batch per file
+  poll     wait for the submitted batches and download their output and error files
+  ingest   parse result files back into sample_sets/descriptions/{high_info,low_info}
+
+Ingest tolerates partial failures: every line is handled on its own and recorded in
+the same job ledger as generate_descriptions.py, so failed, expired or malformed
+requests stay pending and are picked up by the next 'prepare' (or by the async
+generator). Responses are parsed and validated as in the async mode; rejected ones
+are re-requested with the reason they were rejected, and 'run' resubmits them in
+follow-up batches (--validation-retries). 'ingest' needs no network access and works on any saved result file:
+
+    python preprocessing/descriptions/batch_descriptions.py ingest results.jsonl
+
+Usage:
+    python preprocessing/descriptions/batch_descriptions.py run --poll-interval 60
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Optional
+
+# Allow file importing
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from preprocessing.descriptions import generate_descriptions
+from preprocessing.descriptions.generate_descriptions import (
+    MODEL,
+    VALIDATION_RETRIES,
+    JobLedger,
+    build_input,
+    high_info_dir,
+    high_info_output_dir,
+    low_info_output_dir,
+    pending_images,
+    request_options,
+    write_descriptions,
+)
+from preprocessing.descriptions.response_parser import check_response
+
+batch_dir = "sample_sets/descriptions/batches"
+state_path = os.path.join(batch_dir, "state.json")
+
+ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+# Batch input files are limited to 50,000 requests and 200 MB each
+MAX_REQUESTS_PER_FILE = 50_000
+MAX_BYTES_PER_FILE = 190 * 1024 * 1024
+POLL_INTERVAL = 60  # seconds
+FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def load_state() -> Dict[str, dict]:
+    """Return {input file: {batch_id, status, output_file, error_file}}."""
+    if not os.path.isfile(state_path):
+        return {}
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def save_state(state: Dict[str, dict]):
+    os.makedirs(batch_dir, exist_ok=True)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def batch_request(image_file: str, feedback: str = None) -> dict:
+    """One JSONL line of a batch input file; custom_id is the photo's filename."""
+    return {
+        "custom_id": image_file,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": {
+            "model": MODEL,
+            "input": build_input(os.path.join(high_info_dir, image_file), feedback),
+            **request_options(),
+        },
+    }
+
+
+def prepare(image_files: List[str], feedback: Dict[str, str] = None) -> List[str]:
+    """
+    Write batch input files for 'image_files'; returns their paths. 'feedback'
+    maps photos to the reason their previous response was rejected.
+    """
+    feedback = feedback or {}
+    os.makedirs(batch_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+
+    paths, f = [], None
+    n_requests = n_bytes = 0
+    for image_file in image_files:
+        request = batch_request(image_file, feedback.get(image_file))
+        line = (json.dumps(request) + "\n").encode("utf-8")
+        if (
+            f is None
+            or n_requests >= MAX_REQUESTS_PER_FILE
+            or n_bytes + len(line) > MAX_BYTES_PER_FILE
+        ):
+            if f is not None:
+                f.close()
+            paths.append(os.path.join(batch_dir, f"input_{stamp}_{len(paths)}.jsonl"))
+            f = open(paths[-1], "wb")
+            n_requests = n_bytes = 0
+        f.write(line)
+        n_requests += 1
+        n_bytes += len(line)
+    if f is not None:
+        f.close()
+
+    print(f"✓ Wrote {len(image_files)} requests to {len(paths)} batch file(s)")
+    return paths
+
+
+def submit(client, input_paths: List[str]):
+    state = load_state()
+    for path in input_paths:
+        if path in state:
+            print(f"  {path} already submitted as {state[path]['batch_id']}")
+            continue
+        with open(path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+        )
+        state[path] = {"batch_id": batch.id, "status": batch.status}
+        save_state(state)
+        print(f"✓ Submitted {path} as batch {batch.id}")
+
+
+def download(client, file_id: str, path: str) -> str:
+    content = client.files.content(file_id)
+    with open(path, "wb") as f:
+        f.write(content.read())
+    return path
+
+
+def poll(client, poll_interval: float = POLL_INTERVAL) -> List[str]:
+    """
+    Wait until every submitted batch is final and download its result files.
+    Returns the paths of result files that have not been ingested yet.
+    """
+    state = load_state()
+    while True:
+        waiting = 0
+        for path, entry in state.items():
+            if entry["status"] in FINAL_STATES:
+                continue
+            batch = client.batches.retrieve(entry["batch_id"])
+            entry["status"] = batch.status
+            counts = batch.request_counts
+            if batch.status in FINAL_STATES:
+                # Expired and cancelled batches still return their finished part
+                base = os.path.join(
+                    batch_dir, os.path.basename(path)[len("input_") : -len(".jsonl")]
+                )
+                if batch.output_file_id:
+                    entry["output_file"] = download(
+                        client, batch.output_file_id, f"{base}_output.jsonl"
+                    )
+                if batch.error_file_id:
+                    entry["error_file"] = download(
+                        client, batch.error_file_id, f"{base}_errors.jsonl"
+                    )
+                print(f"✓ Batch {entry['batch_id']} {batch.status}")
+            else:
+                waiting += 1
+                if counts is not None:
+                    print(
+                        f"  Batch {entry['batch_id']} {batch.status}: "
+                        f"{counts.completed}/{counts.total} done, {counts.failed} failed"
+                    )
+        save_state(state)
+        if not waiting:
+            break
+        time.sleep(poll_interval)
+
+    return [
+        entry[key]
+        for entry in state.values()
+        for key in ("output_file", "error_file")
+        if entry.get(key) and not entry.get(f"{key}_ingested")
+    ]
+
+
+def response_text(body: dict) -> Optional[str]:
+    """Concatenate the output_text parts of a raw Responses API body."""
+    parts = [
+        content.get("text", "")
+        for item in body.get("output") or []
+        if item.get("type") == "message"
+        for content in item.get("content") or []
+        if content.get("type") == "output_text"
+    ]
+    return "".join(parts) if parts else body.get("output_text")
+
+
+def ingest(result_path: str, ledger: JobLedger) -> Dict[str, int]:
+    """
+    Write the descriptions from one batch output or error file and record every
+    line in the ledger. Returns a count per status.
+    """
+    counts = {"done": 0, "failed": 0, "malformed": 0}
+    with open(result_path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                image_file = result["custom_id"]
+            except (json.JSONDecodeError, KeyError):
+                print(f"❌ Unreadable line {line_number} in {result_path}")
+                continue
+
+            response = result.get("response") or {}
+            body = response.get("body") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                error = result.get("error") or body.get("error") or response
+                ledger.record(image_file, "failed", 1, json.dumps(error))
+                counts["failed"] += 1
+                continue
+
+            text = response_text(body) or ""
+            descriptions, problems = check_response(text)
+            if problems:
+                ledger.record(
+                    image_file, "malformed", 1, "; ".join(problems), response=text
+                )
+                counts["malformed"] += 1
+                continue
+
+            write_descriptions(image_file, *descriptions)
+            ledger.record(image_file, "done", 1)
+            counts["done"] += 1
+
+    print(
+        f"✓ Ingested {result_path}: {counts['done']} described, "
+        f"{counts['failed']} failed, {counts['malformed']} malformed"
+    )
+    return counts
+
+
+def ingest_all(result_paths: List[str]):
+    os.makedirs(high_info_output_dir, exist_ok=True)
+    os.makedirs(low_info_output_dir, exist_ok=True)
+
+    state = load_state()
+    ledger = JobLedger()
+    for path in result_paths:
+        ingest(path, ledger)
+        # Mark downloaded files as ingested so they are not applied twice
+        for entry in state.values():
+            for key in ("output_file", "error_file"):
+                if entry.get(key) == path:
+                    entry[f"{key}_ingested"] = True
+    ledger.close()
+    if state:
+        save_state(state)
+
+
+def prepare_pending() -> List[str]:
+    """
+    Write batch files for every pending photo (see pending_images: photos that
+    already have descriptions are skipped, ledger entry or not); rejected ones
+    carry feedback.
+    """
+    image_files = sorted(
+        f for f in os.listdir(high_info_dir) if f.lower().endswith(".jpg")
+    )
+    ledger = JobLedger()
+    pending = pending_images(image_files, ledger)
+    feedback = {
+        image_file: ledger.records[image_file]["error"]
+        for image_file in pending
+        if ledger.status(image_file) == "malformed"
+    }
+    ledger.close()
+    print(
+        f"{len(pending)} of {len(image_files)} images pending "
+        f"({len(feedback)} rejected before)."
+    )
+    return prepare(pending, feedback) if pending else []
+
+
+def count_rejected() -> int:
+    ledger = JobLedger()
+    ledger.close()
+    return sum(record["status"] == "malformed" for record in ledger.records.values())
+
+
+def make_client():
+    from openai import OpenAI
+
+    return OpenAI()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch API description generation.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("prepare")
+    submit_parser = subparsers.add_parser("submit")
+    submit_parser.add_argument("paths", nargs="*", help="default: all unsubmitted")
+    poll_parser = subparsers.add_parser("poll")
+    poll_parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    ingest_parser = subparsers.add_parser("ingest")
+    ingest_parser.add_argument("paths", nargs="+", help="batch output/error files")
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    run_parser.add_argument(
+        "--validation-retries", type=int, default=VALIDATION_RETRIES
+    )
+    for subparser in (subparsers.choices["prepare"], run_parser):
+        subparser.add_argument(
+            "--structured",
+            action="store_true",
+            help="request JSON structured output instead of key=value text",
+        )
+    args = parser.parse_args()
+    generate_descriptions.structured_output = getattr(args, "structured", False)
+
+    if args.command == "prepare":
+        prepare_pending()
+    elif args.command == "submit":
+        paths = args.paths or sorted(
+            os.path.join(batch_dir, f)
+            for f in os.listdir(batch_dir)
+            if f.startswith("input_") and f.endswith(".jsonl")
+        )
+        submit(make_client(), paths)
+    elif args.command == "poll":
+        print(f"Results ready to ingest: {poll(make_client(), args.poll_interval)}")
+    elif args.command == "ingest":
+        ingest_all(args.paths)
+    elif args.command == "run":
+        client = make_client()
+        for retry_round in range(args.validation_retries + 1):
+            if retry_round:
+                if not count_rejected():
+                    break
+                print(f"\nResubmitting rejected responses (round {retry_round})")
+            submit(client, prepare_pending())
+            ingest_all(poll(client, args.poll_interval))
+        print("\nDone! Rerun to resubmit any failed or malformed images.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Local stand-in for the OpenAI async client, for exercising the description
+pipeline without network access or an API key.
+
+FakeAsyncClient().responses.create(model=..., input=...) sleeps for a simulated
+latency and then either raises a FakeAPIError carrying an HTTP status (429 or 500/503),
+returns a malformed reply, returns descriptions that break the rules in INSTRUCTIONS
+(too long, species named), or returns a well-formed pair of descriptions. When a
+structured output format is requested the descriptions come back as JSON.
+The outcome is drawn from a seeded generator, so runs are reproducible.
+"""
+
+import json
+import random
+import asyncio
+from types import SimpleNamespace
+
+
+class FakeAPIError(Exception):
+    """Mimics an API status error: exposes status_code and response.headers."""
+
+    def __init__(self, status_code: int, retry_after: float = None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class FakeResponses:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        rate_limit_rate: float = 0.1,
+        server_error_rate: float = 0.05,
+        malformed_rate: float = 0.02,
+        invalid_rate: float = 0.05,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.malformed_rate = malformed_rate
+        self.invalid_rate = invalid_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, model: str, input: list, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency * (0.5 + self.rng.random()))
+            draw = self.rng.random()
+            if draw < self.rate_limit_rate:
+                raise FakeAPIError(429, retry_after=self.latency)
+            draw -= self.rate_limit_rate
+            if draw < self.server_error_rate:
+                raise FakeAPIError(self.rng.choice([500, 503]))
+            draw -= self.server_error_rate
+            if draw < self.malformed_rate:
+                return SimpleNamespace(output_text="Sorry, I can't help with that.")
+            draw -= self.malformed_rate
+
+            high_info = (
+                "Medium-sized, slender animal with short, solid grey fur, upright "
+                "pointed ears and a long tail, sitting calmly on a wooden floor."
+            )
+            low_info = "Small grey animal sitting indoors."
+            if draw < self.invalid_rate:
+                low_info = "Small grey cat sitting calmly on a wooden floor indoors."
+            if kwargs.get("text"):
+                output_text = json.dumps({"high_info": high_info, "low_info": low_info})
+            else:
+                output_text = f'high_info="{high_info}" low_info="{low_info}"'
+            return SimpleNamespace(output_text=output_text)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeAsyncClient:
+    def __init__(self, **kwargs):
+        self.responses = FakeResponses(**kwargs)
@@ -1,96 +1,456 @@
-import base64
-import sys
+"""
+Generate a high-info and a low-info description for every high-info photo.
+
+Requests run concurrently on asyncio:
+- a semaphore bounds the number of requests in flight (--concurrency)
+- a token bucket limits the request rate (--rpm)
+- 429, 5xx and connection errors are retried with exponential backoff and jitter,
+  honouring Retry-After when the server sends it (--max-attempts)
+
+Every finished, failed or malformed request is appended to a job ledger
+(sample_sets/descriptions/ledger.jsonl). A rerun only processes photos whose
+descriptions are missing or empty, or whose last ledger entry is failed, malformed
+or pending, so an interrupted or partially failed run is resumed by simply running
+it again. Descriptions written before the ledger existed count as done.
+
+Responses are parsed leniently (JSON / structured output or key=value variants, see
+response_parser.py) and validated against the word limits and the no-species rule.
+Rejected responses are re-requested together, with the reason, after each pass
+(--validation-retries).
+
+Photos are downscaled to the model's effective resolution and re-encoded before
+upload (see upload_cache.py); the bytes saved and per-request latency are reported.
+
+Use --fake to run against a local stand-in client (fake_client.py) instead of the API.
+Its descriptions and ledger go under sample_sets/descriptions_fake, never next to
+the real ones.
+
+Usage:
+    python preprocessing/descriptions/generate_descriptions.py --concurrency 8 --rpm 300 --quality 85
+"""
+
 import os
-import re
-from openai import OpenAI
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+from typing import Dict, Iterable, List, Optional, Tuple
 
 # Allow file importing
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from preprocessing.descriptions.ai_instructions import INSTRUCTIONS
+from preprocessing.descriptions.response_parser import TEXT_FORMAT, check_response
+from preprocessing.descriptions.upload_cache import JPEG_QUALITY, UploadCache
+
+MODEL = "gpt-4o"
+
+high_info_dir = "sample_sets/photos/high_info"
+high_info_output_dir = "sample_sets/descriptions/high_info"
+low_info_output_dir = "sample_sets/descriptions/low_info"
+ledger_path = "sample_sets/descriptions/ledger.jsonl"
+# Output root of --fake runs, kept apart from the real descriptions and ledger
+fake_output_root = "sample_sets/descriptions_fake"
+
+# Ledger statuses that get a photo re-requested
+PENDING_STATUSES = ("failed", "malformed", "pending")
 
-client = OpenAI()
+MAX_CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 300
+MAX_ATTEMPTS = 6
+VALIDATION_RETRIES = 2  # re-request rounds for responses that fail validation
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_MAX = 60.0  # seconds
+
+# Photos are downscaled to the model's effective resolution before upload;
+# main() replaces this with None for --original
+upload_cache = UploadCache()
+
+# Ask for JSON structured output instead of the key=value text format (--structured)
+structured_output = False
 
 
 def encode_image(image_path):
-    """Return a Base64-encoded string from a local image file."""
+    """Return a Base64-encoded string of the (downscaled) image to upload."""
+    if upload_cache is not None:
+        return base64.b64encode(upload_cache.get(image_path)).decode("utf-8")
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode("utf-8")
 
 
-def main():
-    high_info_dir = "sample_sets/photos/high_info"
-    high_info_output_dir = "sample_sets/descriptions/high_info"
-    low_info_output_dir = "sample_sets/descriptions/low_info"
+def build_input(image_path, feedback: str = None) -> list:
+    """
+    Return the Responses API 'input' for one photo. 'feedback' explains why the
+    previous response for this photo was rejected.
+    """
+    data_url = f"data:image/jpeg;base64,{encode_image(image_path)}"
+    content = [
+        {"type": "input_text", "text": INSTRUCTIONS},
+        {"type": "input_image", "image_url": data_url, "detail": "high"},
+    ]
+    if feedback:
+        content.append(
+            {
+                "type": "input_text",
+                "text": f"A previous answer was rejected: {feedback}. "
+                "Answer again, following the format and rules exactly.",
+            }
+        )
+    return [{"role": "user", "content": content}]
 
-    # Ensure output directories exist
-    os.makedirs(high_info_output_dir, exist_ok=True)
-    os.makedirs(low_info_output_dir, exist_ok=True)
 
-    # Gather all images in the high_info directory
-    image_files = [f for f in os.listdir(high_info_dir) if f.lower().endswith(".jpg")]
-
-    # Process each image
-    for idx, image_file in enumerate(image_files, start=1):
-        image_path = os.path.join(high_info_dir, image_file)
-        base64_image = encode_image(image_path)
-        data_url = f"data:image/jpeg;base64,{base64_image}"
-
-        # Call your model
-        response = client.responses.create(
-            model="gpt-4o",
-            input=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": INSTRUCTIONS},
-                        {
-                            "type": "input_image",
-                            "image_url": data_url,
-                            "detail": "high",
-                        },
-                    ],
-                }
-            ],
-        )
+def request_options() -> dict:
+    """Extra Responses API parameters shared by the async and batch modes."""
+    return {"text": {"format": TEXT_FORMAT}} if structured_output else {}
+
+
+def output_paths(image_file) -> Tuple[str, str]:
+    base_name = os.path.splitext(image_file)[0]
+    return (
+        os.path.join(high_info_output_dir, base_name + ".txt"),
+        os.path.join(low_info_output_dir, base_name + ".txt"),
+    )
+
+
+def write_descriptions(image_file, high_info_desc: str, low_info_desc: str):
+    high_info_path, low_info_path = output_paths(image_file)
+    with open(high_info_path, "w") as f:
+        f.write(high_info_desc)
+    with open(low_info_path, "w") as f:
+        f.write(low_info_desc)
+
+
+def has_descriptions(image_file) -> bool:
+    """True if both description files exist and are non-empty."""
+    for path in output_paths(image_file):
+        if not os.path.isfile(path):
+            return False
+        with open(path, "r") as f:
+            if not f.read().strip():
+                return False
+    return True
+
+
+class TokenBucket:
+    """Allows 'rate' acquisitions per second on average, in bursts of up to 'capacity'."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class JobLedger:
+    """Append-only JSONL record of every photo's last outcome; the last line wins."""
+
+    def __init__(self, path: str = None):
+        path = path or ledger_path
+        self.path = path
+        self.records: Dict[str, dict] = {}
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn last line from an interrupted run
+                    self.records[record["image"]] = record
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a")
 
-        # Parse the response
-        response_text = response.output_text.strip()
-        match = re.match(
-            r'high_info="(.+?)"\s+low_info="(.+?)"', response_text, re.DOTALL
+    def record(
+        self, image_file, status: str, attempts: int, error: str = None, **details
+    ):
+        record = {
+            "image": image_file,
+            "status": status,
+            "attempts": attempts,
+            "error": error,
+            "time": time.time(),
+            **details,
+        }
+        self.records[image_file] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def status(self, image_file) -> Optional[str]:
+        record = self.records.get(image_file)
+        return record["status"] if record else None
+
+    def close(self):
+        self._file.close()
+
+
+def pending_images(
+    image_files: Iterable[str], ledger: JobLedger, force: Iterable[str] = ()
+) -> List[str]:
+    """
+    Photos in 'force', photos whose descriptions are missing or empty, and photos
+    whose last ledger entry is in PENDING_STATUSES. Photos with descriptions but no
+    ledger entry (written before the ledger existed) are done.
+    """
+    force = set(force)
+    return [
+        image_file
+        for image_file in image_files
+        if image_file in force
+        or not has_descriptions(image_file)
+        or ledger.status(image_file) in PENDING_STATUSES
+    ]
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # No HTTP status: connection problems and timeouts are worth retrying
+        return "Connection" in type(error).__name__ or isinstance(
+            error, (ConnectionError, asyncio.TimeoutError)
         )
+    return status in (408, 409, 429) or status >= 500
+
 
-        if match:
-            high_info_desc = match.group(1).strip()
-            low_info_desc = match.group(2).strip()
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Exponential backoff with full jitter; a Retry-After header takes precedence."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return min(BACKOFF_MAX, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
 
-            # Create paths for the new txt files based on the image file name
-            base_name = os.path.splitext(image_file)[0]
-            high_info_path = os.path.join(high_info_output_dir, base_name + ".txt")
-            low_info_path = os.path.join(low_info_output_dir, base_name + ".txt")
 
-            # Write out the descriptions
-            with open(high_info_path, "w") as f:
-                f.write(high_info_desc)
+async def describe_image(
+    client,
+    image_file: str,
+    semaphore: asyncio.Semaphore,
+    bucket: TokenBucket,
+    ledger: JobLedger,
+    max_attempts: int = MAX_ATTEMPTS,
+    latencies: Optional[List[float]] = None,
+    feedback: str = None,
+) -> str:
+    """
+    Request, parse, validate and save the descriptions of one photo; returns its
+    status. The round-trip time of every request is appended to 'latencies'.
+    """
+    image_path = os.path.join(high_info_dir, image_file)
 
-            with open(low_info_path, "w") as f:
-                f.write(low_info_desc)
+    for attempt in range(1, max_attempts + 1):
+        await bucket.acquire()
+        try:
+            # Only hold a concurrency slot (and the encoded photo) while in flight
+            async with semaphore:
+                # Encode off the event loop (asyncio.to_thread needs Python 3.9)
+                request_input = await asyncio.get_running_loop().run_in_executor(
+                    None, build_input, image_path, feedback
+                )
+                start = time.perf_counter()
+                try:
+                    response = await client.responses.create(
+                        model=MODEL, input=request_input, **request_options()
+                    )
+                finally:
+                    latency = time.perf_counter() - start
+                    if latencies is not None:
+                        latencies.append(latency)
+        except Exception as e:
+            if is_retryable(e) and attempt < max_attempts:
+                await asyncio.sleep(retry_delay(e, attempt))
+                continue
+            ledger.record(image_file, "failed", attempt, f"{type(e).__name__}: {e}")
+            print(f"❌ Request failed for {image_file} after {attempt} attempts: {e}")
+            return "failed"
 
-            print(
-                f"Descriptions saved successfully for {image_file}:\n"
-                f"  {high_info_path}\n  {low_info_path}"
+        descriptions, problems = check_response(response.output_text)
+        if problems:
+            error = "; ".join(problems)
+            ledger.record(
+                image_file, "malformed", attempt, error, response=response.output_text
             )
-        else:
-            print(
-                f"Response format was incorrect for {image_file}. "
-                f"Here's the response for debugging:\n{response_text}"
+            print(f"❌ Rejected response for {image_file}: {error}")
+            return "malformed"
+
+        write_descriptions(image_file, *descriptions)
+        ledger.record(image_file, "done", attempt, latency=round(latency, 3))
+        return "done"
+
+
+async def generate_all(
+    client,
+    image_files: List[str],
+    ledger: JobLedger,
+    max_concurrency: int = MAX_CONCURRENCY,
+    requests_per_minute: float = REQUESTS_PER_MINUTE,
+    max_attempts: int = MAX_ATTEMPTS,
+    validation_retries: int = VALIDATION_RETRIES,
+) -> Dict[str, int]:
+    """
+    Describe every photo in 'image_files'; returns a count per final status.
+
+    Responses that cannot be parsed or break the rules in INSTRUCTIONS are queued
+    and re-requested together after each pass, with the reason they were rejected,
+    for up to 'validation_retries' extra passes.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    bucket = TokenBucket(requests_per_minute / 60.0, capacity=max_concurrency)
+
+    latencies = []
+    queue, feedback = list(image_files), {}
+    for retry_round in range(validation_retries + 1):
+        if not queue:
+            break
+        if retry_round:
+            print(f"Re-requesting {len(queue)} rejected responses (round {retry_round})")
+
+        tasks = [
+            describe_image(
+                client,
+                image_file,
+                semaphore,
+                bucket,
+                ledger,
+                max_attempts,
+                latencies,
+                feedback.get(image_file),
             )
+            for image_file in queue
+        ]
+        for idx, task in enumerate(asyncio.as_completed(tasks), start=1):
+            await task
+            # Print progress every 10 images
+            if idx % 10 == 0:
+                print(f"Processed {idx} of {len(queue)} images so far...")
+
+        queue = [f for f in queue if ledger.status(f) == "malformed"]
+        feedback = {f: ledger.records[f]["error"] for f in queue}
+
+    if latencies:
+        latencies.sort()
+        print(
+            f"Request latency over {len(latencies)} requests: "
+            f"mean {sum(latencies) / len(latencies):.2f}s, "
+            f"p50 {latencies[len(latencies) // 2]:.2f}s, "
+            f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s"
+        )
+    if upload_cache is not None:
+        print(upload_cache.stats.summary())
+
+    counts = {"done": 0, "failed": 0, "malformed": 0}
+    for image_file in image_files:
+        counts[ledger.status(image_file)] += 1
+    return counts
+
 
-        # Print progress every 10 images
-        if idx % 10 == 0:
-            print(f"Processed {idx} images so far...")
+def make_client(fake: bool = False):
+    if fake:
+        from preprocessing.descriptions.fake_client import FakeAsyncClient
+
+        return FakeAsyncClient()
+
+    from openai import AsyncOpenAI
+
+    # Retries are handled here, with the ledger and rate limiter in the loop
+    return AsyncOpenAI(max_retries=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate photo descriptions.")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE)
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    parser.add_argument(
+        "--only", nargs="+", default=None, help="regenerate just these photos"
+    )
+    parser.add_argument(
+        "--validation-retries",
+        type=int,
+        default=VALIDATION_RETRIES,
+        help="re-request rounds for responses that fail validation",
+    )
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="request JSON structured output instead of key=value text",
+    )
+    parser.add_argument(
+        "--quality", type=int, default=JPEG_QUALITY, help="upload JPEG quality"
+    )
+    parser.add_argument(
+        "--original",
+        action="store_true",
+        help="upload the original photos instead of downscaled copies",
+    )
+    parser.add_argument(
+        "--fake", action="store_true", help="use the local stand-in client"
+    )
+    args = parser.parse_args()
+
+    global upload_cache, structured_output
+    global high_info_output_dir, low_info_output_dir, ledger_path
+    upload_cache = None if args.original else UploadCache(quality=args.quality)
+    structured_output = args.structured
+
+    if args.fake:
+        high_info_output_dir = os.path.join(fake_output_root, "high_info")
+        low_info_output_dir = os.path.join(fake_output_root, "low_info")
+        ledger_path = os.path.join(fake_output_root, "ledger.jsonl")
+        print(f"Fake client: writing descriptions and ledger under {fake_output_root}")
+
+    # Ensure output directories exist
+    os.makedirs(high_info_output_dir, exist_ok=True)
+    os.makedirs(low_info_output_dir, exist_ok=True)
+
+    ledger = JobLedger()
+    if args.only:
+        image_files = pending_images(args.only, ledger, force=args.only)
+    else:
+        # Gather all images in the high_info directory
+        all_files = sorted(
+            f for f in os.listdir(high_info_dir) if f.lower().endswith(".jpg")
+        )
+        image_files = pending_images(all_files, ledger)
+        print(
+            f"{len(all_files) - len(image_files)} of {len(all_files)} images already "
+            f"described; {len(image_files)} pending."
+        )
+
+    start = time.perf_counter()
+    counts = asyncio.run(
+        generate_all(
+            make_client(args.fake),
+            image_files,
+            ledger,
+            args.concurrency,
+            args.rpm,
+            args.max_attempts,
+            args.validation_retries,
+        )
+    )
+    ledger.close()
 
-    # Optional: Print a final summary
-    print(f"\nDone! Processed {len(image_files)} images in total.")
+    print(
+        f"\nDone! Processed {len(image_files)} images in "
+        f"{time.perf_counter() - start:.1f}s: {counts['done']} described, "
+        f"{counts['failed']} failed, {counts['malformed']} malformed."
+    )
+    if counts["failed"] or counts["malformed"]:
+        print("Rerun to retry the failed and malformed images.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+"""
+Parse and validate the model's high_info/low_info description responses.
+
+Accepted formats, tried in order:
+  1. JSON, optionally inside a ``` code fence (this is what structured output returns):
+         {"high_info": "...", "low_info": "..."}
+  2. key=value text in the format INSTRUCTIONS asks for, tolerating drift such as
+     ':' instead of '=', single or curly quotes, missing quotes, other key spellings
+     (high-info, "High info") and either order or separate lines.
+
+Parsed descriptions are then checked against the rules in INSTRUCTIONS: at most 45
+words for high_info, at most 10 for low_info, and no species named.
+"""
+
+import re
+import json
+from typing import List, Optional, Tuple
+
+HIGH_INFO_MAX_WORDS = 45
+LOW_INFO_MAX_WORDS = 10
+
+# Whole words only: hyphenated compounds ("dog-like", "hot-dog") are not species
+SPECIES_PATTERN = re.compile(
+    r"(?<![\w-])(cats?|kittens?|kitty|kitties|dogs?|pupp(?:y|ies)|pups?|doggies?)(?![\w-])",
+    re.IGNORECASE,
+)
+
+# JSON schema for structured output (Responses API text.format)
+TEXT_FORMAT = {
+    "type": "json_schema",
+    "name": "descriptions",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "high_info": {"type": "string"},
+            "low_info": {"type": "string"},
+        },
+        "required": ["high_info", "low_info"],
+        "additionalProperties": False,
+    },
+}
+
+_KEY = r"[\"'`*]*(high|low)[\s_-]*info[\"'`*]*"
+_NEXT_KEY = r"[\"'`*]*(?:high|low)[\s_-]*info[\"'`*]*\s*[=:]"
+_QUOTES = (('"', '"'), ("“", "”"), ("‘", "’"), ("'", "'"))
+
+
+def _quoted(open_quote: str, close_quote: str) -> str:
+    # The value ends at the closing quote that is followed by the next key or the
+    # end of the input, so quotes and apostrophes inside it survive. Failing that,
+    # at the last closing quote of the input, with a trailing remark after it
+    # ignored. Anything else is ambiguous and does not match at all.
+    return (
+        f"{open_quote}((?:(?!{_NEXT_KEY}).)*?){close_quote}"
+        rf"(?=\s*,?\s*(?:{_NEXT_KEY}|\Z))"
+        f"|{open_quote}([^{close_quote}\n]*){close_quote}(?=[^{close_quote}]*\Z)"
+    )
+
+
+# A quoted value (see _quoted), or an unquoted one running to the next key or
+# the end of the line
+_VALUE = (
+    "|".join(_quoted(open_quote, close_quote) for open_quote, close_quote in _QUOTES)
+    + r"|(?![\"“‘'])([^\n]*?)\s*(?=,?\s*"
+    + _NEXT_KEY
+    + r"|,?\s*$)"
+)
+KEY_VALUE_PATTERN = re.compile(
+    _KEY + r"\s*[=:]\s*(?:" + _VALUE + r")",
+    re.IGNORECASE | re.DOTALL | re.MULTILINE,
+)
+FENCE_PATTERN = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
+
+
+def _clean(value: str) -> str:
+    return " ".join(value.split()).strip(" ,")
+
+
+def _parse_json(text: str) -> Optional[Tuple[str, str]]:
+    fenced = FENCE_PATTERN.match(text)
+    if fenced:
+        text = fenced.group(1)
+    if not text.startswith("{"):
+        return None
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    values = {}
+    for key, value in data.items():
+        normalized = re.sub(r"[\s_-]+", "_", str(key).strip().lower())
+        if normalized in ("high_info", "low_info") and isinstance(value, str):
+            values[normalized] = _clean(value)
+    if values.get("high_info") and values.get("low_info"):
+        return values["high_info"], values["low_info"]
+    return None
+
+
+def _parse_key_value(text: str) -> Optional[Tuple[str, str]]:
+    values = {}
+    for match in KEY_VALUE_PATTERN.finditer(text):
+        level = match.group(1).lower()
+        value = next(group for group in match.groups()[1:] if group is not None)
+        values.setdefault(level, _clean(value))
+    if values.get("high") and values.get("low"):
+        return values["high"], values["low"]
+    return None
+
+
+def parse_descriptions(response_text: str) -> Optional[Tuple[str, str]]:
+    """
+    Return (high_info, low_info) descriptions, or None if neither format matches.
+    A quoted value that cannot be split from the rest unambiguously does not
+    match, so the response is rejected and re-requested.
+
+    >>> parse_descriptions('high_info="aa bb" low_info="cc" Hope this helps!')
+    ('aa bb', 'cc')
+    >>> parse_descriptions("high_info=‘aa bb’, low_info=‘cc’ Let me know!")
+    ('aa bb', 'cc')
+    >>> parse_descriptions("high_info='the dog's ear' low_info=cc")
+    ("the dog's ear", 'cc')
+    >>> parse_descriptions('High info: aa bb\\nlow-info: cc')
+    ('aa bb', 'cc')
+    >>> parse_descriptions('high_info="a "quoted" b" low_info="cc"')
+    ('a "quoted" b', 'cc')
+    >>> parse_descriptions('high_info="a "b" c" ok low_info="cc" "d"') is None
+    True
+    """
+    text = response_text.strip()
+    return _parse_json(text) or _parse_key_value(text)
+
+
+def validate_descriptions(high_info_desc: str, low_info_desc: str) -> List[str]:
+    """
+    Return the rules from INSTRUCTIONS that the descriptions break (empty if none).
+
+    >>> validate_descriptions("Dog-like snout, ears up", "hot-dog shaped body")
+    []
+    >>> validate_descriptions("A small dog, ears up", "Kitten.")
+    ['high_info names the species (dog)', 'low_info names the species (kitten)']
+    """
+    problems = []
+    for name, desc, limit in (
+        ("high_info", high_info_desc, HIGH_INFO_MAX_WORDS),
+        ("low_info", low_info_desc, LOW_INFO_MAX_WORDS),
+    ):
+        n_words = len(desc.split())
+        if n_words > limit:
+            problems.append(f"{name} has {n_words} words (max {limit})")
+        species = sorted({m.lower() for m in SPECIES_PATTERN.findall(desc)})
+        if species:
+            problems.append(f"{name} names the species ({', '.join(species)})")
+    return problems
+
+
+def check_response(response_text: str) -> Tuple[Optional[Tuple[str, str]], List[str]]:
+    """
+    Parse and validate one response. Returns (descriptions, problems); descriptions
+    is None if the response could not be parsed at all.
+    """
+    descriptions = parse_descriptions(response_text)
+    if descriptions is None:
+        return None, ["response is not in the requested format"]
+    return descriptions, validate_descriptions(*descriptions)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=False)
+    print("✓ response_parser examples pass")
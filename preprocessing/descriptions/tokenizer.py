@@ -1,41 +1,196 @@
+"""
+Audit the CLIP token lengths of the description sets.
+
+Every info level is tokenized with CLIPTokenizerFast in a single batched call, and
+the levels are audited in parallel. Writes to sample_sets/descriptions/token_audit/:
+- token_counts.png: token count histogram per info level, with the 77-token limit
+- report.json: per-level statistics and every description over the limit
+
+Runs headless. Exits with status 1 if any description exceeds the limit, so it can
+be used as a gate; create_embeddings.py runs the same audit before embedding text
+(--token-gate).
+
+The report records a digest of the descriptions it covers. If they have not changed
+since, the previous report is printed without loading the tokenizer (--force
+re-audits). The tokenizer is loaded from a local snapshot when there is one (see
+preprocessing/vectorize/clip_loader.py).
+
+Usage:
+    python preprocessing/descriptions/tokenizer.py
+"""
+
 import os
-import matplotlib.pyplot as plt
-from transformers import CLIPTokenizerFast
-
-# Use the exact tokenizer CLIP uses (GPT-2 BPE tokenizer)
-tokenizer = CLIPTokenizerFast.from_pretrained("openai/clip-vit-base-patch32")
-
-desc_dir = "sample_sets/descriptions/high_info"
-token_counts = []
-
-# Loop through all description files
-for filename in os.listdir(desc_dir):
-    if filename.endswith(".txt"):
-        path = os.path.join(desc_dir, filename)
-        with open(path, "r") as f:
-            text = f.read().strip()
-            tokens = tokenizer.encode(text)
-            num_tokens = len(tokens)
-            token_counts.append((filename, num_tokens))
-
-# Extract counts for plotting
-counts_only = [count for _, count in token_counts]
-
-# Plot the distribution
-plt.hist(counts_only, bins=20, color="skyblue", edgecolor="black")
-plt.axvline(x=77, color="red", linestyle="--", label="Token Limit (77)")
-plt.xlabel("Token Count")
-plt.ylabel("Frequency")
-plt.title("Token Count Distribution of High-Info Descriptions (CLIP Tokenizer)")
-plt.legend()
-plt.show()
-
-# Identify descriptions exceeding 77 tokens
-over_limit = [(fname, count) for fname, count in token_counts if count > 77]
-
-if over_limit:
-    print("Descriptions exceeding 77 tokens (CLIP tokenizer):")
-    for fname, count in over_limit:
-        print(f"{fname}: {count} tokens")
-else:
-    print("✅ No descriptions exceed 77 tokens (CLIP tokenizer).")
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from preprocessing.vectorize.clip_loader import MODEL_NAME, clip_tokenizer
+
+# The embedding model's own tokenizer (CLIP_MODEL_NAME overrides both)
+TOKENIZER_NAME = MODEL_NAME
+TOKEN_LIMIT = 77  # CLIP text context length, including start/end tokens
+
+desc_dirs = {
+    "high_info": "sample_sets/descriptions/high_info",
+    "low_info": "sample_sets/descriptions/low_info",
+}
+output_dir = "sample_sets/descriptions/token_audit"
+
+
+def read_descriptions(desc_dir: str):
+    """Return sorted (filenames, texts) of the descriptions in 'desc_dir'."""
+    filenames = sorted(f for f in os.listdir(desc_dir) if f.endswith(".txt"))
+    texts = []
+    for filename in filenames:
+        with open(os.path.join(desc_dir, filename), "r") as f:
+            texts.append(f.read().strip())
+    return filenames, texts
+
+
+def token_counts(tokenizer, texts: List[str]) -> np.ndarray:
+    """Token count of every text (with special tokens), from one batched call."""
+    if not texts:
+        return np.zeros(0, dtype=np.int64)
+    encoded = tokenizer(texts, add_special_tokens=True, truncation=False)
+    return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+
+def audit_directory(tokenizer, desc_dir: str, limit: int = TOKEN_LIMIT) -> dict:
+    filenames, texts = read_descriptions(desc_dir)
+    counts = token_counts(tokenizer, texts)
+    over = np.flatnonzero(counts > limit)
+    return {
+        "directory": desc_dir,
+        "count": len(filenames),
+        "max": int(counts.max()) if len(counts) else 0,
+        "mean": round(float(counts.mean()), 2) if len(counts) else 0.0,
+        "p95": round(float(np.percentile(counts, 95)), 2) if len(counts) else 0.0,
+        "over_limit": [
+            {"file": filenames[i], "tokens": int(counts[i])}
+            for i in over[np.argsort(-counts[over])]
+        ],
+        "token_counts": counts.tolist(),
+    }
+
+
+def inputs_digest(dirs: Dict[str, str] = desc_dirs, limit: int = TOKEN_LIMIT) -> str:
+    """Digest of the tokenizer, limit and every description the audit would read."""
+    hasher = hashlib.sha256(f"{TOKENIZER_NAME}\0{limit}".encode("utf-8"))
+    for level, path in sorted(dirs.items()):
+        if not os.path.isdir(path):
+            continue
+        for filename, text in zip(*read_descriptions(path)):
+            hasher.update(f"\0{level}/{filename}\0{text}".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def audit(tokenizer, dirs: Dict[str, str] = desc_dirs, limit: int = TOKEN_LIMIT):
+    """Audit every existing directory in 'dirs' in parallel; returns {level: audit}."""
+    levels = [level for level, path in dirs.items() if os.path.isdir(path)]
+    # The Rust tokenizer releases the GIL, so threads run the levels in parallel
+    with ThreadPoolExecutor(max_workers=max(1, len(levels))) as pool:
+        audits = pool.map(
+            lambda level: audit_directory(tokenizer, dirs[level], limit), levels
+        )
+        return dict(zip(levels, audits))
+
+
+def save_histogram(audits: dict, path: str, limit: int = TOKEN_LIMIT):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for level, result in audits.items():
+        ax.hist(result["token_counts"], bins=20, alpha=0.6, label=level)
+    ax.axvline(x=limit, color="red", linestyle="--", label=f"Token Limit ({limit})")
+    ax.set_xlabel("Token Count")
+    ax.set_ylabel("Frequency")
+    ax.set_title("Token Count Distribution of Descriptions (CLIP Tokenizer)")
+    ax.legend()
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+
+def write_report(
+    audits: dict, out_dir: str = output_dir, limit: int = TOKEN_LIMIT, inputs: str = None
+):
+    """Write report.json and token_counts.png to 'out_dir'."""
+    os.makedirs(out_dir, exist_ok=True)
+    report = {
+        "tokenizer": TOKENIZER_NAME,
+        "limit": limit,
+        "inputs": inputs,
+        "levels": {
+            level: {k: v for k, v in result.items() if k != "token_counts"}
+            for level, result in audits.items()
+        },
+    }
+    with open(os.path.join(out_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    save_histogram(audits, os.path.join(out_dir, "token_counts.png"), limit)
+
+
+def print_summary(audits: dict, limit: int = TOKEN_LIMIT) -> int:
+    """Print per-level results; returns the number of descriptions over the limit."""
+    n_over = 0
+    for level, result in audits.items():
+        over = result["over_limit"]
+        n_over += len(over)
+        print(
+            f"{level}: {result['count']} descriptions, max {result['max']} tokens, "
+            f"mean {result['mean']:.1f}, {len(over)} over {limit}"
+        )
+        for item in over[:10]:
+            print(f"  {item['file']}: {item['tokens']} tokens")
+        if len(over) > 10:
+            print(f"  ... and {len(over) - 10} more")
+    if not n_over:
+        print(f"✅ No descriptions exceed {limit} tokens (CLIP tokenizer).")
+    return n_over
+
+
+def load_report(out_dir: str = output_dir) -> dict:
+    path = os.path.join(out_dir, "report.json")
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit description token lengths.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-audit even if the descriptions are unchanged since the last report",
+    )
+    args = parser.parse_args()
+
+    inputs = inputs_digest()
+    report = load_report()
+    if not args.force and report.get("inputs") == inputs:
+        print("Descriptions unchanged since the last audit:")
+        n_over = print_summary(report["levels"])
+        sys.exit(1 if n_over else 0)
+
+    # Use the exact tokenizer CLIP uses
+    tokenizer = clip_tokenizer(TOKENIZER_NAME)
+
+    audits = audit(tokenizer)
+    write_report(audits, inputs=inputs)
+    n_over = print_summary(audits)
+    print(f"Report and histogram written to {output_dir}")
+    sys.exit(1 if n_over else 0)
+
+
+if __name__ == "__main__":
+    main()
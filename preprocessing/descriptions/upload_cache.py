@@ -0,0 +1,128 @@
+"""
+Downscaled, re-encoded copies of the photos sent to the description model.
+
+With "detail": "high" the model first fits an image within 2048 x 2048 and then
+scales its short side down to 768 px, so any resolution above that only inflates
+the request payload and upload time. UploadCache resizes each photo to that
+effective resolution, re-encodes it as JPEG at a configurable quality and stores
+the result in sample_sets/photos/upload_cache/, keyed by
+
+    sha256(resize/quality config + original bytes)
+
+so repeated runs (and the batch mode) reuse the same payloads. A photo that is
+already small enough and would not shrink when re-encoded is sent unchanged.
+"""
+
+import os
+import io
+import json
+import hashlib
+from dataclasses import dataclass
+from PIL import Image
+
+CACHE_DIR = "sample_sets/photos/upload_cache"
+
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+JPEG_QUALITY = 85
+
+
+@dataclass
+class UploadStats:
+    images: int = 0
+    cache_hits: int = 0
+    original_bytes: int = 0
+    upload_bytes: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.upload_bytes
+
+    def summary(self) -> str:
+        if not self.images:
+            return "No images prepared for upload."
+        saved = 100.0 * self.bytes_saved / self.original_bytes
+        return (
+            f"Upload payloads: {self.images} images, {self.cache_hits} from cache, "
+            f"{self.original_bytes / 1e6:.1f} MB -> {self.upload_bytes / 1e6:.1f} MB "
+            f"({self.bytes_saved / 1e6:.1f} MB, {saved:.0f}% saved)"
+        )
+
+
+def target_size(
+    width: int,
+    height: int,
+    max_short_side: int = MAX_SHORT_SIDE,
+    max_long_side: int = MAX_LONG_SIDE,
+):
+    """Largest size within both limits that keeps the aspect ratio; never upscales."""
+    scale = min(
+        1.0,
+        max_long_side / max(width, height),
+        max_short_side / min(width, height),
+    )
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class UploadCache:
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        quality: int = JPEG_QUALITY,
+        max_short_side: int = MAX_SHORT_SIDE,
+        max_long_side: int = MAX_LONG_SIDE,
+    ):
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self.max_short_side = max_short_side
+        self.max_long_side = max_long_side
+        self.digest = json.dumps(
+            {
+                "quality": quality,
+                "max_short_side": max_short_side,
+                "max_long_side": max_long_side,
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+        self.stats = UploadStats()
+
+    def _encode(self, data: bytes) -> bytes:
+        with Image.open(io.BytesIO(data)) as image:
+            is_jpeg = image.format == "JPEG"
+            size = target_size(*image.size, self.max_short_side, self.max_long_side)
+            downscale = size != image.size
+            image = image.convert("RGB")
+        if downscale:
+            image = image.resize(size, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+        encoded = buffer.getvalue()
+        # Re-encoding alone is only worth it if it shrinks the file
+        if is_jpeg and not downscale and len(encoded) >= len(data):
+            return data
+        return encoded
+
+    def get(self, image_path: str) -> bytes:
+        """Return the JPEG bytes to upload for 'image_path'."""
+        with open(image_path, "rb") as f:
+            data = f.read()
+        key = hashlib.sha256(self.digest + data).hexdigest()
+        cache_path = os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+        self.stats.images += 1
+        self.stats.original_bytes += len(data)
+        if os.path.isfile(cache_path):
+            self.stats.cache_hits += 1
+            with open(cache_path, "rb") as f:
+                encoded = f.read()
+        else:
+            encoded = self._encode(data)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp_path, cache_path)
+
+        self.stats.upload_bytes += len(encoded)
+        return encoded
@@ -1,30 +1,104 @@
+"""
+Create the low-info photo sets by applying pixel dropout to the high-info photos.
+
+Every image is decoded once and all requested dropout levels are produced from a
+single uniform draw per pixel: a pixel is dropped at level p when its draw is below
+p. The masks therefore nest across levels (every pixel dropped at 25% is also
+dropped at 50%, 75% and 90%), and each image has its own generator seeded from the
+base seed and its filename, so the masks are reproducible and independent of
+processing order. Images are processed across a pool of worker processes.
+
+Output: sample_sets/photos/low_info/dropout_<level>/<filename>
+
+Usage:
+    python preprocessing/images/apply_pixel_dropout.py --levels 25 50 75 90 --seed 42
+"""
+
+import os
+import zlib
+import argparse
+from itertools import repeat
 import numpy as np
 from PIL import Image
-import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Sequence
 
 # Paths
 input_dir = "sample_sets/photos/high_info"
-output_dir = "sample_sets/photos/low_info/dropout_25"
+output_root = "sample_sets/photos/low_info"
 
-# Dropout probability
-dropout_probability = 0.25
+# Dropout levels in percent
+DROPOUT_LEVELS = [25, 50, 75, 90]
+SEED = 42
 
-# Ensure output directory exists
-os.makedirs(output_dir, exist_ok=True)
 
-# Apply dropout to all images
-for filename in os.listdir(input_dir):
-    if filename.endswith(".jpg"):
-        input_path = os.path.join(input_dir, filename)
-        output_path = os.path.join(output_dir, filename)
+def image_rng(filename: str, seed: int = SEED) -> np.random.Generator:
+    """Generator for one image, seeded from the base seed and the filename."""
+    return np.random.default_rng([seed, zlib.crc32(filename.encode("utf-8"))])
 
-        img = Image.open(input_path)
-        img_array = np.array(img)
 
-        dropout_mask = np.random.rand(*img_array.shape[:2]) > dropout_probability
+def apply_dropout_levels(
+    img_array: np.ndarray, levels: Sequence[int], rng: np.random.Generator
+) -> Dict[int, np.ndarray]:
+    """
+    Return {level: degraded image} for every dropout level (in percent), all
+    thresholded from the same per-pixel draw so the masks nest.
+    """
+    draws = rng.random(img_array.shape[:2])
+    degraded = {}
+    for level in levels:
+        keep = draws >= level / 100
+        if img_array.ndim == 3:
+            keep = keep[..., None]
+        degraded[level] = img_array * keep.astype(img_array.dtype)
+    return degraded
+
 
-        if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-            dropout_mask = np.stack([dropout_mask] * 3, axis=-1)
+def output_dir_for(level: int) -> str:
+    return os.path.join(output_root, f"dropout_{level}")
 
-        img_dropout = img_array * dropout_mask
+
+def process_image(filename: str, levels: Sequence[int], seed: int = SEED):
+    with Image.open(os.path.join(input_dir, filename)) as img:
+        img_array = np.array(img)
+
+    degraded = apply_dropout_levels(img_array, levels, image_rng(filename, seed))
+    for level, img_dropout in degraded.items():
+        output_path = os.path.join(output_dir_for(level), filename)
         Image.fromarray(img_dropout.astype(np.uint8)).save(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=DROPOUT_LEVELS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    # Ensure output directories exist
+    for level in args.levels:
+        os.makedirs(output_dir_for(level), exist_ok=True)
+
+    filenames = sorted(f for f in os.listdir(input_dir) if f.endswith(".jpg"))
+
+    # Apply dropout to all images
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # Consume the results so worker errors surface here
+        list(
+            pool.map(
+                process_image,
+                filenames,
+                repeat(args.levels),
+                repeat(args.seed),
+                chunksize=16,
+            )
+        )
+
+    print(
+        f"✓ Applied dropout levels {args.levels} to {len(filenames)} images "
+        f"(seed {args.seed})"
+    )
+
+
+if __name__ == "__main__":
+    main()
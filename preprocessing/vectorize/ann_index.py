@@ -0,0 +1,404 @@
+"""
+Approximate nearest-neighbour search over packed embedding sets (IVF, pure numpy).
+
+An IVFIndex clusters the L2-normalized rows of a set into 'n_lists' inverted lists
+with spherical k-means. A query is scored against the list centroids first, and
+only the rows of its 'nprobe' best lists are scored exactly, so a query touches
+about nprobe / n_lists of the set instead of all of it. Scores are cosine
+similarities; with nprobe == n_lists the search is exact.
+
+Indexes live beside the packed sets, in the same layout:
+
+    vector_store/ann/<set_name>/
+        vectors.npy     float32 normalized rows, grouped by list
+        centroids.npy   float32 (n_lists, dim) list centroids
+        rows.npy        int64 row of each stored vector in the packed set
+        index.json      {"ids", "labels", "offsets", "nprobe", "source", ...}
+
+"source" records the size and mtime of the packed set's files; index_for_set
+rebuilds an index whose set has changed since it was built.
+
+Usage:
+    python preprocessing/vectorize/ann_index.py build image/high_info
+    python preprocessing/vectorize/ann_index.py query image/high_info --queries text/high_info --k 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import List, Tuple
+
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from instrumentation.tracing import stage, traced
+from preprocessing.vectorize.vector_store import (
+    INDEX_FILE,
+    PACKED_ROOT,
+    VECTOR_STORE,
+    VECTORS_FILE,
+    PathLike,
+    load_embedding_set,
+    resolve_set_dir,
+)
+
+ANN_ROOT = Path(VECTOR_STORE) / "ann"
+
+CENTROIDS_FILE = "centroids.npy"
+ROWS_FILE = "rows.npy"
+
+KMEANS_ITERATIONS = 10
+# k-means trains on at most this many rows per list, like common IVF implementations
+TRAIN_ROWS_PER_LIST = 64
+# Rows scored per matrix product, to bound memory on large sets
+CHUNK_ROWS = 65536
+# Queries searched together (each keeps nprobe * k candidates)
+QUERY_CHUNK = 4096
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows as float32 (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def default_lists(n: int) -> int:
+    """About sqrt(n) lists, so centroid and list scans cost about the same."""
+    return max(1, int(round(np.sqrt(n))))
+
+
+def default_nprobe(n_lists: int) -> int:
+    return max(1, int(np.ceil(n_lists / 8)))
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column positions of the k highest scores of each row, best first."""
+    k = min(k, scores.shape[-1])
+    if k < scores.shape[-1]:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(k), scores.shape[:-1] + (k,))
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        chunk = vectors[start : start + CHUNK_ROWS]
+        assignment[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignment
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, n_lists: int, n_iter: int = KMEANS_ITERATIONS, seed: int = 0
+) -> np.ndarray:
+    """Unit-norm centroids of normalized 'vectors', trained on a sample of them."""
+    rng = np.random.default_rng(seed)
+    n_train = min(len(vectors), TRAIN_ROWS_PER_LIST * n_lists)
+    train = vectors[np.sort(rng.choice(len(vectors), n_train, replace=False))]
+    centroids = train[rng.choice(n_train, n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = _assign(train, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, train)
+        counts = np.bincount(assignment, minlength=n_lists)
+        # Restart empty lists at random training rows
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = train[rng.choice(n_train, len(empty), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over normalized vectors; search() returns cosine top-k."""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        nprobe: int,
+    ):
+        # vectors[offsets[l]:offsets[l + 1]] is list l; rows maps them back to input rows
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.rows = rows
+        self.nprobe = nprobe
+
+    @classmethod
+    @traced("ann.build")
+    def build(
+        cls,
+        vectors: np.ndarray,
+        n_lists: int = None,
+        nprobe: int = None,
+        n_iter: int = KMEANS_ITERATIONS,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        vectors = normalize(vectors)
+        n_lists = min(n_lists or default_lists(len(vectors)), len(vectors))
+        nprobe = min(nprobe or default_nprobe(n_lists), n_lists)
+        if n_lists == 1:
+            centroids = normalize(vectors.sum(axis=0, keepdims=True))
+            assignment = np.zeros(len(vectors), dtype=np.int64)
+        else:
+            centroids = spherical_kmeans(vectors, n_lists, n_iter, seed)
+            assignment = _assign(vectors, centroids)
+        rows = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists))))
+        return cls(vectors[rows], centroids, offsets, rows, nprobe)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(
+        self, queries: np.ndarray, k: int = 10, nprobe: int = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (scores, rows), each (n_queries, k): the cosine similarities and
+        input rows of every query's nearest neighbours, best first. Queries with
+        fewer than k candidates are padded with score -inf and row -1.
+        """
+        queries = normalize(np.atleast_2d(queries))
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+
+        if nprobe == self.n_lists:
+            # Exact: score every row, a chunk of queries at a time
+            step = max(1, CHUNK_ROWS * 64 // max(1, len(self.vectors)))
+            for start in range(0, len(queries), step):
+                sims = queries[start : start + step] @ self.vectors.T
+                best = top_k(sims, k)
+                n = best.shape[1]
+                scores[start : start + step, :n] = np.take_along_axis(sims, best, axis=1)
+                rows[start : start + step, :n] = self.rows[best]
+            return scores, rows
+
+        for start in range(0, len(queries), QUERY_CHUNK):
+            chunk = slice(start, start + QUERY_CHUNK)
+            scores[chunk], rows[chunk] = self._search_lists(queries[chunk], k, nprobe)
+        return scores, rows
+
+    def _search_lists(self, queries: np.ndarray, k: int, nprobe: int):
+        probes = top_k(queries @ self.centroids.T, nprobe)
+        # Each (query, probe) pair gets k candidate slots, filled list by list: one
+        # matrix product per list covers every query that probes it
+        candidate_scores = np.full((len(queries), nprobe * k), -np.inf, dtype=np.float32)
+        candidate_rows = np.full((len(queries), nprobe * k), -1, dtype=np.int64)
+        flat = probes.ravel()
+        order = np.argsort(flat, kind="stable")
+        bounds = np.searchsorted(flat[order], np.arange(self.n_lists + 1))
+        for l in np.flatnonzero(np.diff(bounds)):
+            start, end = self.offsets[l], self.offsets[l + 1]
+            if start == end:
+                continue
+            pairs = order[bounds[l] : bounds[l + 1]]
+            q, slot = pairs // nprobe, (pairs % nprobe) * k
+            sims = queries[q] @ self.vectors[start:end].T
+            best = top_k(sims, k)
+            columns = slot[:, None] + np.arange(best.shape[1])
+            candidate_scores[q[:, None], columns] = np.take_along_axis(sims, best, axis=1)
+            candidate_rows[q[:, None], columns] = self.rows[start + best]
+
+        best = top_k(candidate_scores, k)
+        return (
+            np.take_along_axis(candidate_scores, best, axis=1),
+            np.take_along_axis(candidate_rows, best, axis=1),
+        )
+
+    def save(self, index_dir: PathLike, metadata: dict = None) -> Path:
+        """Write the index (plus 'metadata' in index.json), replacing files atomically."""
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            VECTORS_FILE: np.ascontiguousarray(self.vectors, dtype=np.float32),
+            CENTROIDS_FILE: np.ascontiguousarray(self.centroids, dtype=np.float32),
+            ROWS_FILE: np.asarray(self.rows, dtype=np.int64),
+        }
+        index = dict(metadata or {})
+        index.update(offsets=self.offsets.tolist(), nprobe=self.nprobe)
+
+        for filename, array in arrays.items():
+            with open(index_dir / f".{filename}.tmp", "wb") as f:
+                np.save(f, array)
+        with open(index_dir / f".{INDEX_FILE}.tmp", "w") as f:
+            json.dump(index, f)
+        for filename in list(arrays) + [INDEX_FILE]:
+            os.replace(index_dir / f".{filename}.tmp", index_dir / filename)
+        return index_dir
+
+    @classmethod
+    @traced("ann.load")
+    def load(cls, index_dir: PathLike, mmap: bool = True) -> Tuple["IVFIndex", dict]:
+        """Load a saved index; returns (index, the rest of its index.json)."""
+        index_dir = Path(index_dir)
+        with open(index_dir / INDEX_FILE, "r") as f:
+            metadata = json.load(f)
+        mode = "r" if mmap else None
+        index = cls(
+            np.load(index_dir / VECTORS_FILE, mmap_mode=mode),
+            np.load(index_dir / CENTROIDS_FILE),
+            metadata.pop("offsets"),
+            np.load(index_dir / ROWS_FILE),
+            metadata.pop("nprobe"),
+        )
+        return index, metadata
+
+
+def source_stat(set_name: PathLike, root: PathLike = PACKED_ROOT) -> str:
+    """Size and mtime of a packed set's files; changes whenever the set is rewritten."""
+    set_dir = resolve_set_dir(set_name, root)
+    stats = [os.stat(set_dir / filename) for filename in (VECTORS_FILE, INDEX_FILE)]
+    return ";".join(f"{s.st_size}:{s.st_mtime_ns}" for s in stats)
+
+
+def ann_dir(set_name: PathLike, ann_root: PathLike = ANN_ROOT) -> Path:
+    return Path(ann_root) / set_name
+
+
+def build_set_index(
+    set_name: str,
+    root: PathLike = PACKED_ROOT,
+    ann_root: PathLike = ANN_ROOT,
+    n_lists: int = None,
+    nprobe: int = None,
+) -> Tuple[IVFIndex, List[str], np.ndarray]:
+    """Build and save the index of packed set 'set_name'; returns (index, ids, labels)."""
+    stat = source_stat(set_name, root)
+    vectors, labels, ids = load_embedding_set(set_name, root)
+    index = IVFIndex.build(vectors, n_lists, nprobe)
+    metadata = {
+        "set": str(set_name),
+        "ids": ids,
+        "labels": labels.tolist(),
+        "dim": int(vectors.shape[1]),
+        "source": stat,
+    }
+    index.save(ann_dir(set_name, ann_root), metadata)
+    return index, ids, labels
+
+
+def index_for_set(
+    set_name: str,
+    root: PathLike = PACKED_ROOT,
+    ann_root: PathLike = ANN_ROOT,
+    rebuild: bool = False,
+) -> Tuple[IVFIndex, List[str], np.ndarray]:
+    """
+    The saved index of 'set_name' as (index, ids, labels), built first if it is
+    missing, stale or 'rebuild' is set.
+    """
+    index_dir = ann_dir(set_name, ann_root)
+    if not rebuild and (index_dir / INDEX_FILE).is_file():
+        index, metadata = IVFIndex.load(index_dir)
+        if metadata.get("source") == source_stat(set_name, root):
+            return index, metadata["ids"], np.asarray(metadata["labels"], dtype=np.int64)
+        print(f"Index {index_dir} is stale. Rebuilding.")
+    return build_set_index(set_name, root, ann_root)
+
+
+def recall_at_k(index: IVFIndex, queries: np.ndarray, k: int = 10) -> float:
+    """Fraction of the exact top-k neighbours the approximate search returns."""
+    _, approx = index.search(queries, k)
+    _, exact = index.search(queries, k, nprobe=index.n_lists)
+    hits = [len(np.intersect1d(a[a >= 0], e[e >= 0])) for a, e in zip(approx, exact)]
+    return float(np.sum(hits) / max(1, np.sum(exact >= 0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build and query approximate nearest-neighbour indexes of packed sets."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build (or rebuild) set indexes")
+    build.add_argument("sets", nargs="+", help="packed set names, e.g. image/high_info")
+    build.add_argument("--lists", type=int, default=None, help="default: sqrt(n)")
+    build.add_argument("--nprobe", type=int, default=None, help="default: lists / 8")
+
+    query = commands.add_parser(
+        "query", help="search a set's index with every row of another (or the same) set"
+    )
+    query.add_argument("set", help="indexed set, e.g. image/high_info")
+    query.add_argument("--queries", help="query set (default: the indexed set)")
+    query.add_argument("--k", type=int, default=10)
+    query.add_argument("--nprobe", type=int, default=None)
+    query.add_argument("--show", type=int, default=3, help="queries to print results for")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for set_name in args.sets:
+            start = time.perf_counter()
+            index, ids, _ = build_set_index(
+                set_name, n_lists=args.lists, nprobe=args.nprobe
+            )
+            print(
+                f"✓ {set_name}: {len(ids)} vectors in {index.n_lists} lists "
+                f"(nprobe {index.nprobe}) built in {time.perf_counter() - start:.2f}s "
+                f"-> {ann_dir(set_name)}"
+            )
+        return
+
+    start = time.perf_counter()
+    index, ids, labels = index_for_set(args.set)
+    load_s = time.perf_counter() - start
+    query_set = args.queries or args.set
+    queries, query_labels, query_ids = load_embedding_set(query_set)
+    if args.nprobe:
+        index.nprobe = min(args.nprobe, index.n_lists)
+
+    same_set = query_set == args.set
+    with stage("ann.query", set=args.set, items=len(queries)):
+        start = time.perf_counter()
+        scores, rows = index.search(queries, args.k + same_set)
+        query_s = time.perf_counter() - start
+    if same_set:
+        # Drop each query's match with itself
+        keep = np.argsort(rows == np.arange(len(rows))[:, None], axis=1, kind="stable")
+        keep = keep[:, : args.k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        rows = np.take_along_axis(rows, keep, axis=1)
+    print(
+        f"{args.set}: {len(index)} vectors, {index.n_lists} lists, nprobe {index.nprobe} "
+        f"(loaded in {1000 * load_s:.1f} ms)"
+    )
+    print(
+        f"{len(queries)} queries from {query_set} in {query_s:.3f}s "
+        f"({1000 * query_s / len(queries):.3f} ms/query)"
+    )
+
+    found = rows >= 0
+    neighbour_labels = np.where(found, labels[np.maximum(rows, 0)], -1)
+    precision = (neighbour_labels == query_labels[:, None]).sum() / max(1, found.sum())
+    print(f"  class precision@{args.k}: {precision:.3f}")
+    if not same_set:
+        # Cross-modal retrieval: does each query find its own sample?
+        position = {sample_id: row for row, sample_id in enumerate(ids)}
+        targets = np.array([position.get(sample_id, -2) for sample_id in query_ids])
+        hit_rate = np.mean((rows == targets[:, None]).any(axis=1))
+        print(f"  same-sample recall@{args.k}: {hit_rate:.3f}")
+    sample = queries[:: max(1, len(queries) // 200)]
+    print(f"  recall@{args.k} vs exact search: {recall_at_k(index, sample, args.k):.3f}")
+
+    for q in range(min(args.show, len(queries))):
+        neighbours = ", ".join(
+            f"{ids[row]} ({score:.3f})" for score, row in zip(scores[q], rows[q]) if row >= 0
+        )
+        print(f"  {query_ids[q]}: {neighbours}")
+
+
+if __name__ == "__main__":
+    main()
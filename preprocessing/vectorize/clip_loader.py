@@ -0,0 +1,148 @@
+"""
+Lazy, memoized CLIP handles shared by the embedding and tokenizer scripts.
+
+Importing this module (or the scripts that use it) imports neither torch nor
+transformers, which alone take several seconds. The model, processor and tokenizer
+are loaded by the first call that needs them, once per process, so scripts can
+decide whether there is any work to do before paying for a model load.
+
+Models load from a local snapshot whenever one exists, without network access:
+CLIP_MODEL_NAME may be a checkpoint directory, and a hub name is resolved to its
+snapshot in the local Hugging Face cache (HF_HUB_CACHE, HF_HOME/hub or
+~/.cache/huggingface/hub). Only when there is no snapshot is the hub contacted,
+unless CLIP_OFFLINE=1 (or HF_HUB_OFFLINE=1) is set, which makes that an error.
+"""
+
+import os
+import json
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+try:
+    from importlib import metadata
+except ImportError:  # Python 3.7: the importlib_metadata backport
+    import importlib_metadata as metadata
+
+from instrumentation.tracing import stage
+from preprocessing.vectorize.embedding_cache import CACHE_ROOT
+
+# Hub name or local checkpoint directory; CLIP_MODEL_NAME overrides it (the
+# benchmarks point it at a small randomly initialized checkpoint)
+MODEL_NAME = os.environ.get("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32")
+
+# Image processor configs keyed by snapshot (see image_processor_config)
+PROCESSOR_CONFIGS_FILE = CACHE_ROOT / "image_processor_configs.json"
+# Where a snapshot keeps its image processor settings (newer transformers versions
+# save them inside processor_config.json)
+PROCESSOR_CONFIG_NAMES = ("preprocessor_config.json", "processor_config.json")
+
+
+def offline() -> bool:
+    return any(
+        os.environ.get(var, "").lower() in ("1", "true", "yes")
+        for var in ("CLIP_OFFLINE", "HF_HUB_OFFLINE")
+    )
+
+
+def _hub_cache() -> Path:
+    if os.environ.get("HF_HUB_CACHE"):
+        return Path(os.environ["HF_HUB_CACHE"])
+    hf_home = os.environ.get("HF_HOME", os.path.join("~", ".cache", "huggingface"))
+    return Path(hf_home).expanduser() / "hub"
+
+
+@lru_cache(maxsize=None)
+def local_snapshot(name: str = MODEL_NAME) -> Optional[str]:
+    """Local directory holding checkpoint 'name', or None if it is not on disk."""
+    if os.path.isdir(name):
+        return name
+    repo_dir = _hub_cache() / f"models--{name.replace('/', '--')}"
+    ref = repo_dir / "refs" / "main"
+    if not ref.is_file():
+        return None
+    snapshot = repo_dir / "snapshots" / ref.read_text().strip()
+    return str(snapshot) if snapshot.is_dir() else None
+
+
+def _source(name: str) -> str:
+    snapshot = local_snapshot(name)
+    if snapshot is not None:
+        return snapshot
+    if offline():
+        raise FileNotFoundError(
+            f"No local snapshot of {name} (looked in {_hub_cache()}). Download it "
+            f"once without CLIP_OFFLINE, or point CLIP_MODEL_NAME at a checkpoint."
+        )
+    return name
+
+
+@lru_cache(maxsize=None)
+def clip_model(name: str = MODEL_NAME, backend: str = "fp32"):
+    """CLIPModel 'name' in eval mode, for inference backend 'backend' (see quantized.py)."""
+    if backend != "fp32":
+        from preprocessing.vectorize.quantized import load_backend
+
+        return load_backend(clip_model(name), backend)
+    with stage("load_model", model=name):
+        from transformers import CLIPModel
+
+        model = CLIPModel.from_pretrained(_source(name))
+    model.eval()
+    return model
+
+
+@lru_cache(maxsize=None)
+def clip_processor(name: str = MODEL_NAME):
+    with stage("load_processor", model=name):
+        from transformers import CLIPProcessor
+
+        return CLIPProcessor.from_pretrained(_source(name))
+
+
+@lru_cache(maxsize=None)
+def clip_tokenizer(name: str = MODEL_NAME):
+    with stage("load_tokenizer", model=name):
+        from transformers import CLIPTokenizerFast
+
+        return CLIPTokenizerFast.from_pretrained(_source(name))
+
+
+def image_processor_config(name: str = MODEL_NAME) -> dict:
+    """
+    The image processor's to_dict(), which is part of every image's cache key.
+
+    Loading the processor means importing transformers, so the dict is kept in
+    PROCESSOR_CONFIGS_FILE, keyed by the snapshot's processor config files and
+    the transformers version; a run that finds nothing to embed never loads it.
+    """
+    snapshot = local_snapshot(name)
+    config_paths = [
+        os.path.join(snapshot, filename)
+        for filename in PROCESSOR_CONFIG_NAMES
+        if snapshot and os.path.isfile(os.path.join(snapshot, filename))
+    ]
+    if not config_paths:
+        return clip_processor(name).image_processor.to_dict()
+
+    hasher = hashlib.sha256(f"{name}\0{metadata.version('transformers')}".encode())
+    for path in config_paths:
+        with open(path, "rb") as f:
+            hasher.update(b"\0" + f.read())
+    source = hasher.hexdigest()
+
+    configs = {}
+    if PROCESSOR_CONFIGS_FILE.is_file():
+        with open(PROCESSOR_CONFIGS_FILE, "r") as f:
+            configs = json.load(f)
+    if source not in configs:
+        # Round-trip through JSON so the cached and fresh dicts digest the same
+        config = clip_processor(name).image_processor.to_dict()
+        configs[source] = json.loads(json.dumps(config, sort_keys=True, default=str))
+        PROCESSOR_CONFIGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = PROCESSOR_CONFIGS_FILE.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(configs, f, indent=2)
+        os.replace(tmp_path, PROCESSOR_CONFIGS_FILE)
+    return configs[source]
@@ -1,75 +1,664 @@
+"""
+Generate CLIP embeddings for every photo and description set and store each one
+as a packed set in vector_store/packed (see preprocessing/vectorize/vector_store.py).
+
+Images are decoded and preprocessed by a pool of DataLoader workers while the main
+process runs batched inference on the previous batch. Descriptions are tokenized
+and embedded in padded batches. Throughput (items/sec) is reported for every set.
+
+Runs are incremental: every item is looked up in a content-addressed cache
+(see preprocessing/vectorize/embedding_cache.py) and only new or changed inputs are
+embedded. Missing, partial or stale sets are rebuilt from the cache plus those items.
+
+Descriptions are audited against CLIP's 77-token limit first (--token-gate, see
+preprocessing/descriptions/tokenizer.py). Longer descriptions are split into
+overlapping token windows whose embeddings are pooled into one vector
+(--text-pooling); the windows of all descriptions share batches.
+
+--backend int8 runs CLIP with dynamically int8-quantized linear layers (see
+preprocessing/vectorize/quantized.py), which is about twice as fast on CPU. Before
+embedding, a sample of photos and descriptions is embedded with both backends and
+the cosine similarity, classifier accuracy delta and speedup are reported; the run
+stops if the embeddings drift too far from fp32. Quantized embeddings are cached
+under their own keys, separate from the fp32 ones.
+
+Every run starts with a planning phase that only lists and hashes the inputs and
+compares them with the packed sets and the cache. The model is loaded (see
+preprocessing/vectorize/clip_loader.py) only if something actually needs
+embedding, so a run with every set up to date finishes in well under a second.
+--dry-run prints the plan and exits.
+
+Sets built by another script (the in-memory dropout sets of degrade_and_embed.py)
+are skipped rather than overwritten; delete such a set to rebuild it here.
+
+Usage:
+    python preprocessing/vectorize/create_embeddings.py --batch-size 64 --num-workers 4 --threads 8
+    python preprocessing/vectorize/create_embeddings.py --dry-run
+"""
+
 import os
-import torch
+import sys
+import time
+import argparse
 import numpy as np
-from transformers import CLIPProcessor, CLIPModel
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from PIL import Image
 
-# Load CLIP model once
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
+from instrumentation.tracing import stage, traced
+from preprocessing.descriptions.tokenizer import TOKEN_LIMIT, audit, print_summary
+from preprocessing.vectorize.clip_loader import (
+    MODEL_NAME,
+    clip_model,
+    clip_processor,
+    image_processor_config,
+)
+from preprocessing.vectorize.embedding_cache import (
+    EmbeddingCache,
+    config_digest,
+    item_key,
+)
+from preprocessing.vectorize.quantized import (
+    BACKENDS,
+    PARITY_MIN_COSINE,
+    parity_report,
+    print_parity,
+)
+from preprocessing.vectorize.vector_store import (
+    load_embedding_set,
+    load_set_index,
+    resolve_set_dir,
+    write_embedding_set,
+)
 
-# Helper functions
-def get_image_embedding(image_path):
-    image = Image.open(image_path)
-    inputs = processor(images=image, return_tensors="pt")
-    with torch.no_grad():
-        outputs = model.get_image_features(**inputs)
-    return outputs[0].numpy()
+# Inference backend of the model returned by get_model() (see use_backend)
+backend = "fp32"
 
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png"]
+TEXT_EXTENSIONS = [".txt"]
 
-def get_text_embedding(text_path):
-    with open(text_path, "r") as file:
-        text = file.read().strip()
-    inputs = processor(text=[text], return_tensors="pt", padding=True)
-    with torch.no_grad():
-        outputs = model.get_text_features(**inputs)
-    return outputs[0].numpy()
+# Long descriptions: CLIP sees 77 tokens including the start/end tokens
+TEXT_WINDOW = 75
+CHUNK_OVERLAP = 16
+TEXT_POOLING = "mean"  # "mean", "weighted" (by window length) or "truncate"
+
+# Photos and descriptions per class embedded by both backends for the parity check
+PARITY_SAMPLES = 32
 
+# Defaults: leave one core per decode worker, give the rest to torch
+BATCH_SIZE = 64
+NUM_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 4))
+TORCH_THREADS = max(1, (os.cpu_count() or 1) - NUM_WORKERS)
 
-# Define directories to process
+# Define packed sets to generate (set name -> source directory)
 data_dirs = {
-    "image_embeddings/high_info": "sample_sets/photos/high_info",
-    "image_embeddings/low_info/dropout_25": "sample_sets/photos/low_info/dropout_25",
-    "image_embeddings/low_info/dropout_50": "sample_sets/photos/low_info/dropout_50",
-    "image_embeddings/low_info/dropout_75": "sample_sets/photos/low_info/dropout_75",
-    "image_embeddings/low_info/dropout_90": "sample_sets/photos/low_info/dropout_90",
-    "text_embeddings/high_info": "sample_sets/descriptions/high_info",
-    "text_embeddings/low_info": "sample_sets/descriptions/low_info",
+    "image/high_info": "sample_sets/photos/high_info",
+    "image/low_info/dropout_25": "sample_sets/photos/low_info/dropout_25",
+    "image/low_info/dropout_50": "sample_sets/photos/low_info/dropout_50",
+    "image/low_info/dropout_75": "sample_sets/photos/low_info/dropout_75",
+    "image/low_info/dropout_90": "sample_sets/photos/low_info/dropout_90",
+    "text/high_info": "sample_sets/descriptions/high_info",
+    "text/low_info": "sample_sets/descriptions/low_info",
 }
 
-# Process each directory
-for embed_dir, data_dir in data_dirs.items():
-    # Ensure embedding directories exist
-    embed_full_dir = os.path.join("vector_store", embed_dir)
-    os.makedirs(embed_full_dir, exist_ok=True)
 
-    # Check if directory already has embeddings
-    existing_files = os.listdir(embed_full_dir)
-    if existing_files:
-        print(
-            f"Directory {embed_full_dir} already has {len(existing_files)} embeddings. Skipping."
+def get_model():
+    """The CLIP model for the current backend, loaded on first use."""
+    return clip_model(MODEL_NAME, backend)
+
+
+def get_processor():
+    """The CLIP processor (tokenizer and image processor), loaded on first use."""
+    return clip_processor(MODEL_NAME)
+
+
+def __getattr__(name):
+    # 'model' and 'processor' used to be loaded at import; resolve them lazily
+    if name == "model":
+        return get_model()
+    if name == "processor":
+        return get_processor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ImageFileDataset:
+    """
+    Decodes and preprocesses one image per item; runs inside DataLoader workers.
+    A plain map-style dataset, so defining it does not import torch.
+    """
+
+    def __init__(self, paths, image_processor):
+        self.paths = list(paths)
+        self.image_processor = image_processor
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        with Image.open(self.paths[idx]) as image:
+            image = image.convert("RGB")
+        inputs = self.image_processor(images=image, return_tensors="pt")
+        return inputs["pixel_values"][0]
+
+
+def _features(outputs) -> np.ndarray:
+    import torch
+
+    # Newer transformers versions wrap projected features in a model output
+    if not isinstance(outputs, torch.Tensor):
+        outputs = outputs.pooler_output
+    return outputs.numpy()
+
+
+def embed_pixel_batches(batches) -> np.ndarray:
+    """Run preprocessed pixel_values batches through the image tower."""
+    import torch
+
+    model = get_model()
+    embeddings = []
+    with torch.inference_mode():
+        for pixel_values in batches:
+            outputs = model.get_image_features(pixel_values=pixel_values)
+            embeddings.append(_features(outputs))
+    return np.concatenate(embeddings).astype(np.float32)
+
+
+def embed_images(
+    paths, batch_size: int = BATCH_SIZE, num_workers: int = NUM_WORKERS
+) -> np.ndarray:
+    """Return one embedding row per image path, in input order."""
+    from torch.utils.data import DataLoader
+
+    loader = DataLoader(
+        ImageFileDataset(paths, get_processor().image_processor),
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        prefetch_factor=2 if num_workers > 0 else None,
+    )
+    with stage("embed_images", batch_size=batch_size, num_workers=num_workers) as s:
+        s.items = len(paths)
+        return embed_pixel_batches(loader)
+
+
+def chunk_token_ids(
+    token_ids: List[int], window: int = TEXT_WINDOW, overlap: int = CHUNK_OVERLAP
+) -> List[List[int]]:
+    """
+    Split one text's token ids (without start/end tokens) into windows of at most
+    'window' tokens that overlap by 'overlap'; the last window ends at the text's end.
+    """
+    if len(token_ids) <= window:
+        return [token_ids]
+    stride = window - overlap
+    starts = list(range(0, len(token_ids) - window, stride)) + [len(token_ids) - window]
+    return [token_ids[start : start + window] for start in starts]
+
+
+def embed_texts(
+    texts, batch_size: int = BATCH_SIZE, text_pooling: str = TEXT_POOLING
+) -> np.ndarray:
+    """
+    Return one embedding row per text.
+
+    Texts longer than CLIP's context are split into overlapping token windows and
+    the window embeddings are pooled ("mean", or "weighted" by window length);
+    "truncate" cuts them at the context length instead. The windows of all texts are
+    packed into shared batches, sorted by length to keep padding low.
+    """
+    import torch
+
+    model = get_model()
+    tokenizer = get_processor().tokenizer
+    texts = list(texts)
+    with stage("tokenize", items=len(texts)):
+        token_ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    if text_pooling == "truncate":
+        chunks = [(i, ids[:TEXT_WINDOW]) for i, ids in enumerate(token_ids)]
+    else:
+        chunks = [
+            (i, chunk) for i, ids in enumerate(token_ids) for chunk in chunk_token_ids(ids)
+        ]
+
+    order = sorted(range(len(chunks)), key=lambda c: len(chunks[c][1]))
+    chunk_embeddings = [None] * len(chunks)
+    with stage("embed_text_windows", texts=len(texts)) as s, torch.inference_mode():
+        s.items = len(chunks)
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            sequences = [
+                [tokenizer.bos_token_id] + chunks[c][1] + [tokenizer.eos_token_id]
+                for c in batch
+            ]
+            length = max(len(seq) for seq in sequences)
+            input_ids = torch.full(
+                (len(batch), length), tokenizer.pad_token_id, dtype=torch.long
+            )
+            attention_mask = torch.zeros((len(batch), length), dtype=torch.long)
+            for row, seq in enumerate(sequences):
+                input_ids[row, : len(seq)] = torch.tensor(seq)
+                attention_mask[row, : len(seq)] = 1
+            features = _features(
+                model.get_text_features(
+                    input_ids=input_ids, attention_mask=attention_mask
+                )
+            )
+            for row, c in enumerate(batch):
+                chunk_embeddings[c] = features[row]
+
+    # Pool the windows of each text back into one vector
+    embeddings = np.zeros((len(texts), len(chunk_embeddings[0])), dtype=np.float64)
+    weights = np.zeros(len(texts))
+    for (i, chunk), vector in zip(chunks, chunk_embeddings):
+        weight = len(chunk) if text_pooling == "weighted" else 1.0
+        embeddings[i] += weight * vector
+        weights[i] += weight
+    return (embeddings / weights[:, None]).astype(np.float32)
+
+
+def read_text(text_path) -> str:
+    with open(text_path, "r") as file:
+        return file.read().strip()
+
+
+# Single-item helpers
+def get_image_embedding(image_path):
+    return embed_images([image_path], batch_size=1, num_workers=0)[0]
+
+
+def get_text_embedding(text_path):
+    return embed_texts([read_text(text_path)])[0]
+
+
+def list_inputs(data_dir: str, data_type: str):
+    """Return sorted (ids, paths) of the embeddable files in 'data_dir'."""
+    extensions = IMAGE_EXTENSIONS if data_type == "image" else TEXT_EXTENSIONS
+    ids, paths = [], []
+    for filename in sorted(os.listdir(data_dir)):
+        base_name, ext = os.path.splitext(filename)
+        if ext.lower() in extensions:
+            ids.append(base_name)
+            paths.append(os.path.join(data_dir, filename))
+    return ids, paths
+
+
+def preprocessing_config(data_type: str, text_pooling: str = TEXT_POOLING) -> dict:
+    """Everything besides the input bytes and model name that shapes an embedding."""
+    if data_type == "image":
+        config = {"type": "image", "image_processor": image_processor_config(MODEL_NAME)}
+    else:
+        config = {"type": "text", "strip": True, "padding": True, "pooling": text_pooling}
+        if text_pooling != "truncate":
+            config.update(window=TEXT_WINDOW, overlap=CHUNK_OVERLAP)
+    # Only set for non-default backends, so existing fp32 cache keys stay valid
+    if backend != "fp32":
+        config["backend"] = backend
+    return config
+
+
+def use_backend(name: str):
+    """Run inference with backend 'name' from now on (see quantized.py)."""
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r} (expected one of {BACKENDS})")
+    backend = name
+
+
+def parity_sample(data_dir: str, data_type: str, per_class: int):
+    """Up to 'per_class' evenly spaced inputs of each class from 'data_dir'."""
+    if not os.path.isdir(data_dir):
+        return [], np.array([], dtype=int)
+    ids, paths = list_inputs(data_dir, data_type)
+    sample, labels = [], []
+    for label, prefix in enumerate(("cat", "dog")):
+        class_paths = [p for i, p in zip(ids, paths) if i.startswith(prefix)]
+        step = max(1, len(class_paths) // per_class)
+        chosen = class_paths[::step][:per_class]
+        sample += chosen
+        labels += [label] * len(chosen)
+    return sample, np.array(labels)
+
+
+def check_parity(
+    name: str,
+    per_class: int = PARITY_SAMPLES,
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = NUM_WORKERS,
+    text_pooling: str = TEXT_POOLING,
+) -> bool:
+    """
+    Embed a sample of the high-info photos and descriptions with fp32 and with
+    backend 'name' and report how the embeddings compare; 'name' stays selected.
+    Returns whether the backend meets PARITY_MIN_COSINE.
+    """
+    image_paths, image_labels = parity_sample(
+        data_dirs["image/high_info"], "image", per_class
+    )
+    text_paths, text_labels = parity_sample(
+        data_dirs["text/high_info"], "text", per_class
+    )
+    texts = [read_text(path) for path in text_paths]
+
+    def embed_sample() -> tuple:
+        embeddings, seconds = {}, {}
+        if image_paths:
+            start = time.perf_counter()
+            embeddings["image"] = embed_images(image_paths, batch_size, num_workers)
+            seconds["image"] = time.perf_counter() - start
+        if texts:
+            start = time.perf_counter()
+            embeddings["text"] = embed_texts(texts, batch_size, text_pooling)
+            seconds["text"] = time.perf_counter() - start
+        return embeddings, seconds
+
+    with stage("parity_check", backend=name) as s:
+        s.items = len(image_paths) + len(texts)
+        if not s.items:
+            print("Warning: No high-info inputs to check parity on. Skipping.")
+            use_backend(name)
+            return True
+        use_backend("fp32")
+        reference, reference_seconds = embed_sample()
+        use_backend(name)
+        candidate, candidate_seconds = embed_sample()
+        report = parity_report(
+            reference,
+            candidate,
+            {"image": image_labels, "text": text_labels},
+            {"fp32": reference_seconds, "candidate": candidate_seconds},
         )
-        continue
+    return print_parity(report, name)
+
 
-    print(f"Generating embeddings for {embed_dir}...")
+@dataclass
+class SetPlan:
+    """What bringing one packed set up to date takes (see plan_directory)."""
+
+    set_name: str
+    data_dir: str
+    data_type: str
+    # "up to date", "stale or partial", "missing", "no inputs" or "built elsewhere"
+    state: str
+    ids: List[str] = field(default_factory=list)
+    paths: List[str] = field(default_factory=list)
+    keys: List[str] = field(default_factory=list)
+    texts: Optional[List[str]] = None
+    # Filled in by lookup_cache: row position -> cached vector, rows to embed
+    found: Dict[int, np.ndarray] = field(default_factory=dict)
+    missing: List[int] = field(default_factory=list)
+
+    @property
+    def pending(self) -> bool:
+        return self.state in ("stale or partial", "missing")
+
+
+@traced()
+def plan_directory(
+    set_name: str, data_dir: str, text_pooling: str = TEXT_POOLING
+) -> SetPlan:
+    """
+    Compare the files in 'data_dir' with packed set 'set_name' by content key,
+    without loading the model.
+    """
     data_type = "image" if "photos" in data_dir else "text"
+    if not os.path.isdir(data_dir):
+        print(f"Warning: Source directory {data_dir} not found. Skipping.")
+        return SetPlan(set_name, data_dir, data_type, "no inputs")
 
-    # Process each file
-    for filename in os.listdir(data_dir):
-        base_name, ext = os.path.splitext(filename)
-        if data_type == "image" and ext.lower() in [".jpg", ".jpeg", ".png"]:
-            data_path = os.path.join(data_dir, filename)
-            embedding = get_image_embedding(data_path)
+    ids, paths = list_inputs(data_dir, data_type)
+    if not ids:
+        print(f"Warning: No {data_type} files found in {data_dir}. Skipping.")
+        return SetPlan(set_name, data_dir, data_type, "no inputs")
 
-        elif data_type == "text" and ext.lower() == ".txt":
-            data_path = os.path.join(data_dir, filename)
-            embedding = get_text_embedding(data_path)
+    index = load_set_index(set_name)
+    if index.get("source"):
+        print(
+            f"Set {resolve_set_dir(set_name)} was built by {index['source']}.py; "
+            f"skipping. Delete it to rebuild it from {data_dir}."
+        )
+        return SetPlan(set_name, data_dir, data_type, "built elsewhere", ids)
 
+    # Key every input by its content and the model/preprocessing config
+    digest = config_digest(MODEL_NAME, preprocessing_config(data_type, text_pooling))
+    with stage("hash_inputs", set=set_name, items=len(paths)):
+        if data_type == "image":
+            texts = None
+            keys = []
+            for path in paths:
+                with open(path, "rb") as file:
+                    keys.append(item_key(digest, file.read()))
         else:
-            continue  # Skip any non-matching files
+            texts = [read_text(path) for path in paths]
+            keys = [item_key(digest, text.encode("utf-8")) for text in texts]
+
+    if index.get("ids") == ids and index.get("keys") == keys:
+        state = "up to date"
+        print(f"Set {resolve_set_dir(set_name)} is up to date ({len(ids)} embeddings).")
+    elif index or resolve_set_dir(set_name).exists():
+        state = "stale or partial"
+    else:
+        state = "missing"
+    return SetPlan(set_name, data_dir, data_type, state, ids, paths, keys, texts)
+
+
+def lookup_cache(plan: SetPlan, cache: EmbeddingCache):
+    """Split a pending set's rows into cached ('found') and to-embed ('missing')."""
+    # Rows of an existing set are reusable even if the cache was cleared
+    index = load_set_index(plan.set_name)
+    if index.get("keys"):
+        vectors, _, _ = load_embedding_set(plan.set_name)
+        for key, vector in zip(index["keys"], vectors):
+            if key not in cache:
+                cache.put(key, vector)
+    elif index.get("ids") == plan.ids and backend == "fp32":
+        # Sets migrated from the legacy layout carry no keys; their rows are taken
+        # as the fp32 embeddings of the inputs with the same IDs
+        vectors, _, _ = load_embedding_set(plan.set_name)
+        for key, vector in zip(plan.keys, vectors):
+            if key not in cache:
+                cache.put(key, vector)
+        print(f"  Keyed {len(plan.ids)} migrated embeddings of {plan.set_name}")
+    plan.found, plan.missing = cache.lookup(plan.keys)
+
+
+@traced()
+def update_set(
+    plan: SetPlan,
+    cache: EmbeddingCache,
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = NUM_WORKERS,
+    text_pooling: str = TEXT_POOLING,
+):
+    """
+    Embed the missing rows of a looked-up plan and write its packed set.
+    New embeddings are added to 'cache' but not saved; the caller saves it once
+    after all its sets (an interrupted run loses nothing, since the written sets
+    seed the cache again, see lookup_cache). Returns the number of cache hits and
+    misses.
+    """
+    found, missing = plan.found, plan.missing
+    new_embeddings = None
+    if missing:
+        start = time.perf_counter()
+        if plan.data_type == "image":
+            new_embeddings = embed_images(
+                [plan.paths[i] for i in missing], batch_size, num_workers
+            )
+        else:
+            new_embeddings = embed_texts(
+                [plan.texts[i] for i in missing], batch_size, text_pooling
+            )
+        elapsed = time.perf_counter() - start
+        cache.put_many([plan.keys[i] for i in missing], new_embeddings)
+        print(
+            f"  Embedded {len(missing)} {plan.data_type}s in {elapsed:.1f}s "
+            f"({len(missing) / elapsed:.1f} items/sec)"
+        )
+
+    # Assemble the full set in input order from cached and new rows
+    dim = len(next(iter(found.values()))) if found else new_embeddings.shape[1]
+    embeddings = np.empty((len(plan.ids), dim), dtype=np.float32)
+    for position, vector in found.items():
+        embeddings[position] = vector
+    if missing:
+        embeddings[missing] = new_embeddings
+
+    set_dir = write_embedding_set(plan.set_name, embeddings, plan.ids, keys=plan.keys)
+    print(f"  ✓ Saved {len(plan.ids)} embeddings to {set_dir}")
+    return len(found), len(missing)
+
+
+def embed_directory(
+    set_name: str,
+    data_dir: str,
+    cache: EmbeddingCache,
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = NUM_WORKERS,
+    text_pooling: str = TEXT_POOLING,
+):
+    """
+    Bring packed set 'set_name' up to date with the files in 'data_dir',
+    embedding only the items that are not in 'cache'.
+    Returns the number of cache hits and misses.
+    """
+    plan = plan_directory(set_name, data_dir, text_pooling)
+    if not plan.pending:
+        return len(plan.ids), 0
+    lookup_cache(plan, cache)
+    print(
+        f"Updating {set_name} ({plan.state}): {len(plan.missing)} of {len(plan.ids)} "
+        f"{plan.data_type}s need embedding, {len(plan.found)} cached"
+    )
+    counts = update_set(plan, cache, batch_size, num_workers, text_pooling)
+    cache.save()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate packed CLIP embeddings.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=NUM_WORKERS,
+        help="image decode/preprocess worker processes (0 = decode in main process)",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=TORCH_THREADS, help="torch intra-op threads"
+    )
+    parser.add_argument(
+        "--token-gate",
+        choices=["fail", "warn", "off"],
+        default="warn",
+        help=f"audit descriptions for the {TOKEN_LIMIT}-token limit before embedding",
+    )
+    parser.add_argument(
+        "--text-pooling",
+        choices=["mean", "weighted", "truncate"],
+        default=TEXT_POOLING,
+        help="how descriptions longer than the context are embedded",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="fp32",
+        help="CLIP inference backend (int8: dynamically quantized linear layers)",
+    )
+    parser.add_argument(
+        "--parity-samples",
+        type=int,
+        default=PARITY_SAMPLES,
+        help="photos and descriptions per class compared against fp32 (0 = no check)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report which sets are out of date and how much needs embedding",
+    )
+    args = parser.parse_args()
+
+    # Cache keys depend on the backend, so it is chosen before planning
+    use_backend(args.backend)
+    plans = [
+        plan_directory(set_name, data_dir, args.text_pooling)
+        for set_name, data_dir in data_dirs.items()
+    ]
+    pending = [plan for plan in plans if plan.pending]
+    up_to_date = sum(len(plan.ids) for plan in plans if plan.state == "up to date")
+    if not pending:
+        print(f"\n✅ Nothing to embed. All {up_to_date} embeddings are up to date.")
+        return
+
+    cache = EmbeddingCache(MODEL_NAME)
+    for plan in pending:
+        lookup_cache(plan, cache)
+        print(
+            f"{'Would update' if args.dry_run else 'Updating'} {plan.set_name} "
+            f"({plan.state}): {len(plan.missing)} of {len(plan.ids)} "
+            f"{plan.data_type}s need embedding, {len(plan.found)} cached"
+        )
+    to_embed = [plan for plan in pending if plan.missing]
+    if args.dry_run:
+        n_missing = sum(len(plan.missing) for plan in to_embed)
+        print(
+            f"\nDry run: {len(pending)} set(s) to update, {n_missing} items to embed "
+            f"({'model load needed' if to_embed else 'from the cache only'})."
+        )
+        return
+
+    text_dirs = {
+        plan.set_name: plan.data_dir for plan in to_embed if plan.data_type == "text"
+    }
+    if text_dirs and args.token_gate != "off":
+        with stage("token_audit"):
+            n_over = print_summary(audit(get_processor().tokenizer, text_dirs))
+        if n_over and args.token_gate == "fail":
+            sys.exit(
+                f"❌ {n_over} descriptions exceed {TOKEN_LIMIT} tokens. Shorten them, "
+                f"or rerun with --token-gate warn to chunk and pool them."
+            )
+
+    if to_embed:
+        import torch
+
+        torch.set_num_threads(args.threads)
+        print(
+            f"Batch size: {args.batch_size}, decode workers: {args.num_workers}, "
+            f"torch threads: {torch.get_num_threads()}, backend: {args.backend}"
+        )
+        if args.backend != "fp32" and args.parity_samples > 0:
+            ok = check_parity(
+                args.backend,
+                args.parity_samples,
+                args.batch_size,
+                args.num_workers,
+                args.text_pooling,
+            )
+            if not ok:
+                sys.exit(
+                    f"❌ {args.backend} embeddings are below a mean cosine similarity of "
+                    f"{PARITY_MIN_COSINE} to fp32. Use --backend fp32."
+                )
+
+    total_hits, total_misses = up_to_date, 0
+    for plan in pending:
+        hits, misses = update_set(
+            plan, cache, args.batch_size, args.num_workers, args.text_pooling
+        )
+        total_hits += hits
+        total_misses += misses
+    cache.save()
+
+    total = total_hits + total_misses
+    hit_rate = 100.0 * total_hits / total if total else 0.0
+    print(
+        f"\n✅ Done. Cache: {total_hits} hits, {total_misses} misses "
+        f"({hit_rate:.1f}% hit rate), {len(cache)} cached embeddings"
+    )
+
 
-        # Save embedding
-        embedding_path = os.path.join(embed_full_dir, f"{base_name}.npy")
-        np.save(embedding_path, embedding)
-        print(f"Saved embedding to {embedding_path}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Degrade-and-embed: build the low-info image sets straight from the high-info photos.
+
+Each high-info photo is decoded once inside a DataLoader worker, pixel dropout is
+applied to the decoded array in memory for every requested level (same nested,
+per-image seeded masks as preprocessing/images/apply_pixel_dropout.py), and all
+levels go through the batched CLIP image encoder together. Nothing is re-encoded
+as JPEG in between, so the embeddings see the exact dropout mask instead of a
+compression-smeared one, and adding a level costs no disk traffic.
+
+Writing the degraded JPEGs to sample_sets/photos/low_info/dropout_<level> is an
+optional side output (--save-jpeg). The packed sets are written to
+vector_store/packed/image/low_info/dropout_<level> and marked as built here, so
+create_embeddings.py leaves them alone instead of rebuilding them from the JPEG
+folders; delete a set to hand it back to create_embeddings.py.
+
+Usage:
+    python preprocessing/vectorize/degrade_and_embed.py --levels 25 50 75 90 --seed 42
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from preprocessing.images.apply_pixel_dropout import (
+    DROPOUT_LEVELS,
+    SEED,
+    apply_dropout_levels,
+    image_rng,
+    output_dir_for,
+)
+from preprocessing.vectorize.create_embeddings import (
+    BATCH_SIZE,
+    MODEL_NAME,
+    NUM_WORKERS,
+    TORCH_THREADS,
+    _features,
+    get_model,
+    get_processor,
+    list_inputs,
+    preprocessing_config,
+)
+from preprocessing.vectorize.embedding_cache import (
+    EmbeddingCache,
+    config_digest,
+    item_key,
+)
+from preprocessing.vectorize.vector_store import (
+    image_set_name,
+    load_set_index,
+    write_embedding_set,
+)
+
+SOURCE_DIR = "sample_sets/photos/high_info"
+# Recorded in the index of every set written here (see write_embedding_set)
+SET_SOURCE = "degrade_and_embed"
+
+
+class DegradedImageDataset:
+    """
+    Decodes one photo per item and returns the preprocessed pixel_values of all its
+    dropout levels, shaped (n_levels, 3, H, W). Runs inside DataLoader workers.
+    A plain map-style dataset, so defining it does not import torch.
+    """
+
+    def __init__(self, paths, image_processor, levels, seed=SEED, save_jpeg=False):
+        self.paths = list(paths)
+        self.image_processor = image_processor
+        self.levels = list(levels)
+        self.seed = seed
+        self.save_jpeg = save_jpeg
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        filename = os.path.basename(self.paths[idx])
+        with Image.open(self.paths[idx]) as image:
+            img_array = np.array(image.convert("RGB"))
+
+        degraded = apply_dropout_levels(
+            img_array, self.levels, image_rng(filename, self.seed)
+        )
+        if self.save_jpeg:
+            for level, img_dropout in degraded.items():
+                output_path = os.path.join(output_dir_for(level), filename)
+                Image.fromarray(img_dropout).save(output_path)
+
+        inputs = self.image_processor(
+            images=[degraded[level] for level in self.levels], return_tensors="pt"
+        )
+        return inputs["pixel_values"]
+
+
+def embed_degraded_images(
+    paths,
+    levels,
+    seed: int = SEED,
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = NUM_WORKERS,
+    save_jpeg: bool = False,
+) -> np.ndarray:
+    """
+    Return the (n_images, n_levels, dim) embeddings of every photo at every
+    dropout level, in input order.
+    """
+    import torch
+    from torch.utils.data import DataLoader
+
+    loader = DataLoader(
+        DegradedImageDataset(
+            paths, get_processor().image_processor, levels, seed, save_jpeg
+        ),
+        # Every item expands to len(levels) encoder inputs
+        batch_size=max(1, batch_size // len(levels)),
+        shuffle=False,
+        num_workers=num_workers,
+        prefetch_factor=2 if num_workers > 0 else None,
+    )
+
+    model = get_model()
+    embeddings = []
+    with torch.inference_mode():
+        for pixel_values in loader:
+            n_images, n_levels = pixel_values.shape[:2]
+            outputs = model.get_image_features(
+                pixel_values=pixel_values.flatten(0, 1)
+            )
+            embeddings.append(_features(outputs).reshape(n_images, n_levels, -1))
+    return np.concatenate(embeddings).astype(np.float32)
+
+
+def dropout_digest(level: int, seed: int) -> str:
+    """Config digest for embeddings of in-memory degraded photos at one level."""
+    config = preprocessing_config("image")
+    config["dropout"] = {"level": level, "seed": seed, "in_memory": True}
+    return config_digest(MODEL_NAME, config)
+
+
+def degrade_and_embed(
+    levels,
+    cache: EmbeddingCache,
+    seed: int = SEED,
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = NUM_WORKERS,
+    save_jpeg: bool = False,
+):
+    """
+    Bring the packed dropout sets for 'levels' up to date with the high-info photos,
+    embedding only photos that miss the cache at some level.
+    Returns the number of cache hits and misses (one per photo and level).
+    """
+    if not os.path.isdir(SOURCE_DIR):
+        print(f"Warning: Source directory {SOURCE_DIR} not found. Skipping.")
+        return 0, 0
+
+    ids, paths = list_inputs(SOURCE_DIR, "image")
+    if not ids:
+        print(f"Warning: No image files found in {SOURCE_DIR}. Skipping.")
+        return 0, 0
+
+    if save_jpeg:
+        for level in levels:
+            os.makedirs(output_dir_for(level), exist_ok=True)
+
+    # Key every (photo, level) by the source bytes and the dropout config
+    sources = []
+    for path in paths:
+        with open(path, "rb") as file:
+            sources.append(file.read())
+    keys = {
+        level: [item_key(dropout_digest(level, seed), data) for data in sources]
+        for level in levels
+    }
+
+    # With --save-jpeg every photo is degraded again so the side output is complete
+    missing = set(range(len(ids))) if save_jpeg else set()
+    hits = 0
+    for level in levels:
+        found, level_missing = cache.lookup(keys[level])
+        hits += len(found)
+        missing.update(level_missing)
+    missing = sorted(missing)
+    misses = len(ids) * len(levels) - hits
+
+    print(
+        f"Degrading {len(missing)} of {len(ids)} photos at levels {list(levels)} "
+        f"(seed {seed}); {hits} of {len(ids) * len(levels)} embeddings cached"
+    )
+    if missing:
+        start = time.perf_counter()
+        new_embeddings = embed_degraded_images(
+            [paths[i] for i in missing],
+            levels,
+            seed,
+            batch_size,
+            num_workers,
+            save_jpeg,
+        )
+        elapsed = time.perf_counter() - start
+        for column, level in enumerate(levels):
+            cache.put_many([keys[level][i] for i in missing], new_embeddings[:, column])
+        cache.save()
+        print(
+            f"  Embedded {len(missing)} photos x {len(levels)} levels in {elapsed:.1f}s "
+            f"({len(missing) * len(levels) / elapsed:.1f} items/sec, "
+            f"{len(missing) / elapsed:.1f} decodes/sec)"
+        )
+
+    for level in levels:
+        set_name = image_set_name("low_info", level)
+        index = load_set_index(set_name)
+        if (
+            index.get("ids") == ids
+            and index.get("keys") == keys[level]
+            and index.get("source") == SET_SOURCE
+        ):
+            print(f"  Set {set_name} is up to date ({len(ids)} embeddings).")
+            continue
+        embeddings = np.stack([cache.get(key) for key in keys[level]])
+        write_embedding_set(
+            set_name, embeddings, ids, keys=keys[level], source=SET_SOURCE
+        )
+        print(f"  ✓ Saved {len(ids)} embeddings to {set_name}")
+
+    return hits, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Embed pixel-dropout levels without a JPEG round-trip."
+    )
+    parser.add_argument("--levels", type=int, nargs="+", default=DROPOUT_LEVELS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument(
+        "--save-jpeg",
+        action="store_true",
+        help="also write the degraded photos to sample_sets/photos/low_info",
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--num-workers", type=int, default=NUM_WORKERS)
+    parser.add_argument(
+        "--threads", type=int, default=TORCH_THREADS, help="torch intra-op threads"
+    )
+    args = parser.parse_args()
+
+    import torch
+
+    torch.set_num_threads(args.threads)
+    cache = EmbeddingCache(MODEL_NAME)
+    hits, misses = degrade_and_embed(
+        args.levels,
+        cache,
+        args.seed,
+        args.batch_size,
+        args.num_workers,
+        args.save_jpeg,
+    )
+
+    total = hits + misses
+    hit_rate = 100.0 * hits / total if total else 0.0
+    print(
+        f"\n✅ Done. Cache: {hits} hits, {misses} misses ({hit_rate:.1f}% hit rate)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Embed the high-info photos at a whole range of pixel-dropout levels in one pass.
+
+Each photo is decoded once; all dropout variants (the nested, per-image seeded masks
+of preprocessing/images/apply_pixel_dropout.py) are generated in memory and embedded
+together through the batched CLIP image encoder (see degrade_and_embed.py). No photo,
+embedding or combined-embedding directory is written per level; the result is one
+array of shape (n_levels, n_samples, dim):
+
+    vector_store/sweeps/dropout_<first>-<last>_step<step>_seed<seed>/
+        vectors.npy   float32 (level, sample, dim)
+        index.json    {"levels", "ids", "labels", "dim", "seed", "model"}
+
+With --evaluate, image-only logistic regression accuracy (5-fold CV) is computed at
+every level and written next to the array as accuracy.csv.
+
+Usage:
+    python preprocessing/vectorize/dropout_sweep.py --start 0 --stop 95 --step 5 --evaluate
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from preprocessing.images.apply_pixel_dropout import SEED
+from preprocessing.vectorize.create_embeddings import (
+    BATCH_SIZE,
+    MODEL_NAME,
+    NUM_WORKERS,
+    list_inputs,
+)
+from preprocessing.vectorize.degrade_and_embed import (
+    SOURCE_DIR,
+    embed_degraded_images,
+)
+from preprocessing.vectorize.vector_store import (
+    INDEX_FILE,
+    VECTOR_STORE,
+    VECTORS_FILE,
+    label_from_id,
+)
+
+SWEEP_ROOT = Path(VECTOR_STORE) / "sweeps"
+
+
+def sweep_name(levels: Sequence[int], seed: int) -> str:
+    step = levels[1] - levels[0] if len(levels) > 1 else 0
+    return f"dropout_{levels[0]}-{levels[-1]}_step{step}_seed{seed}"
+
+
+def write_sweep(
+    sweep_dir: Path,
+    vectors: np.ndarray,
+    levels: Sequence[int],
+    ids: Sequence[str],
+    seed: int,
+):
+    """Write a (level, sample, dim) sweep array and its index atomically."""
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    index = {
+        "levels": [int(level) for level in levels],
+        "ids": list(ids),
+        "labels": [label_from_id(i) for i in ids],
+        "dim": int(vectors.shape[2]),
+        "seed": seed,
+        "model": MODEL_NAME,
+    }
+    tmp_vectors = sweep_dir / f".{VECTORS_FILE}.tmp"
+    tmp_index = sweep_dir / f".{INDEX_FILE}.tmp"
+    with open(tmp_vectors, "wb") as f:
+        np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+    with open(tmp_index, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_vectors, sweep_dir / VECTORS_FILE)
+    os.replace(tmp_index, sweep_dir / INDEX_FILE)
+
+
+def load_sweep(
+    sweep_dir, mmap: bool = True
+) -> Tuple[List[int], np.ndarray, np.ndarray, List[str]]:
+    """Return (levels, vectors (level, sample, dim), labels, ids) of a sweep."""
+    sweep_dir = Path(sweep_dir)
+    with open(sweep_dir / INDEX_FILE, "r") as f:
+        index = json.load(f)
+    vectors = np.load(sweep_dir / VECTORS_FILE, mmap_mode="r" if mmap else None)
+    return index["levels"], vectors, np.array(index["labels"]), index["ids"]
+
+
+def evaluate_sweep(sweep_dir, cv: int = 5, random_state: int = 42) -> List[list]:
+    """Image-only logistic regression accuracy at every level of a sweep."""
+    from sklearn.linear_model import LogisticRegression
+
+    from classifiers.evaluation import cross_validate_once
+
+    levels, vectors, labels, _ = load_sweep(sweep_dir)
+    rows = []
+    for level, level_vectors in zip(levels, vectors):
+        result = cross_validate_once(
+            LogisticRegression(max_iter=1000),
+            np.asarray(level_vectors),
+            labels,
+            cv,
+            random_state,
+        )
+        rows.append([level, result.accuracy_mean, result.accuracy_std])
+        print(
+            f"  [dropout {level}%] Accuracy: "
+            f"{result.accuracy_mean:.3f} ± {result.accuracy_std:.3f}"
+        )
+
+    with open(Path(sweep_dir) / "accuracy.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["dropout_level", "accuracy_mean", "accuracy_std"])
+        for level, mean, std in rows:
+            writer.writerow([level, f"{mean:.3f}", f"{std:.3f}"])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding-level dropout sweep.")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--stop", type=int, default=95, help="last level (inclusive)")
+    parser.add_argument("--step", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--num-workers", type=int, default=NUM_WORKERS)
+    parser.add_argument(
+        "--evaluate",
+        action="store_true",
+        help="also cross-validate image-only accuracy at every level",
+    )
+    args = parser.parse_args()
+
+    levels = list(range(args.start, args.stop + 1, args.step))
+    ids, paths = list_inputs(SOURCE_DIR, "image")
+    if not ids:
+        sys.exit(f"No image files found in {SOURCE_DIR}.")
+
+    start = time.perf_counter()
+    embeddings = embed_degraded_images(
+        paths, levels, args.seed, args.batch_size, args.num_workers
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Embedded {len(ids)} photos x {len(levels)} levels in {elapsed:.1f}s "
+        f"({len(ids) * len(levels) / elapsed:.1f} items/sec)"
+    )
+
+    sweep_dir = SWEEP_ROOT / sweep_name(levels, args.seed)
+    write_sweep(sweep_dir, embeddings.transpose(1, 0, 2), levels, ids, args.seed)
+    print(
+        f"✓ Saved {len(levels)} x {len(ids)} x {embeddings.shape[2]} sweep "
+        f"to {sweep_dir}"
+    )
+
+    if args.evaluate:
+        evaluate_sweep(sweep_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Content-addressed cache of CLIP embeddings.
+
+Every embedded item is keyed by
+
+    sha256(config digest + input bytes)
+
+where the config digest covers the model name and the preprocessing configuration.
+Adding photos or editing descriptions therefore only misses the cache for those items,
+and changing the model or preprocessing invalidates everything it should.
+
+The cache for one model lives in vector_store/cache/<model>/ as a single
+vectors.npy matrix plus a keys.json list, row-aligned, like the packed sets.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from preprocessing.vectorize.vector_store import VECTOR_STORE
+
+CACHE_ROOT = Path(VECTOR_STORE) / "cache"
+
+VECTORS_FILE = "vectors.npy"
+KEYS_FILE = "keys.json"
+
+
+def config_digest(model_name: str, config: dict) -> str:
+    """Hash the model name and preprocessing config into one digest."""
+    payload = json.dumps(
+        {"model": model_name, "config": config}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def item_key(digest: str, data: bytes) -> str:
+    """Return the cache key for one input under a given config digest."""
+    hasher = hashlib.sha256(digest.encode("utf-8"))
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+class EmbeddingCache:
+    """Maps content keys to embedding vectors for one model."""
+
+    def __init__(self, model_name: str, root=CACHE_ROOT):
+        self.dir = Path(root) / model_name.replace("/", "__")
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        vectors_path = self.dir / VECTORS_FILE
+        keys_path = self.dir / KEYS_FILE
+        if not (vectors_path.is_file() and keys_path.is_file()):
+            return
+
+        with open(keys_path, "r") as f:
+            keys = json.load(f)
+        vectors = np.load(vectors_path)
+        if vectors.ndim != 2 or len(keys) != vectors.shape[0]:
+            print(f"Warning: Cache at {self.dir} is inconsistent. Starting empty.")
+            return
+        self._vectors = dict(zip(keys, vectors))
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def __contains__(self, key: str):
+        return key in self._vectors
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self._vectors.get(key)
+
+    def put(self, key: str, vector: np.ndarray):
+        self._vectors[key] = np.asarray(vector, dtype=np.float32)
+        self._dirty = True
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        for key, vector in zip(keys, vectors):
+            self.put(key, vector)
+
+    def lookup(self, keys: Sequence[str]):
+        """
+        Return ({position: vector} for cached keys, [positions of missing keys]).
+        """
+        found, missing = {}, []
+        for position, key in enumerate(keys):
+            vector = self.get(key)
+            if vector is None:
+                missing.append(position)
+            else:
+                found[position] = vector
+        return found, missing
+
+    def save(self):
+        """Write the cache to disk (atomically) if anything was added."""
+        if not self._dirty or not self._vectors:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        keys: List[str] = list(self._vectors)
+        vectors = np.stack([self._vectors[key] for key in keys]).astype(np.float32)
+
+        tmp_vectors = self.dir / f".{VECTORS_FILE}.tmp"
+        tmp_keys = self.dir / f".{KEYS_FILE}.tmp"
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, vectors)
+        with open(tmp_keys, "w") as f:
+            json.dump(keys, f)
+        os.replace(tmp_vectors, self.dir / VECTORS_FILE)
+        os.replace(tmp_keys, self.dir / KEYS_FILE)
+        self._dirty = False
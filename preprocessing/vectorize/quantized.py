@@ -0,0 +1,127 @@
+"""
+Faster CPU inference backends for the CLIP towers, and the parity check that
+guards them.
+
+"int8" applies dynamic int8 quantization to every nn.Linear of CLIPModel
+(attention projections, MLPs and the final projections): weights are stored as
+int8, activations are quantized on the fly per batch, and matmuls run through
+fbgemm/oneDNN int8 kernels. No calibration data or export step is needed, and
+the result is a drop-in replacement exposing get_image_features/get_text_features.
+
+Quantization changes the embeddings slightly, so create_embeddings.py compares
+every non-fp32 backend with fp32 on a sample of the photos and descriptions
+before embedding anything (see parity_report): per-item cosine similarity,
+throughput of both backends, and the image-only / text-only logistic regression
+accuracy of each, so the downstream effect is visible.
+"""
+
+import warnings
+import numpy as np
+from typing import Dict
+
+BACKENDS = ("fp32", "int8")
+
+# Minimum mean cosine similarity to fp32 for a backend to be used
+PARITY_MIN_COSINE = 0.99
+
+
+def quantize_model(model):
+    """Return a copy of torch module 'model' with dynamically int8-quantized Linear layers."""
+    import torch
+
+    with warnings.catch_warnings():
+        # torch.ao.quantization is deprecated in favour of torchao, which is not
+        # a dependency here; the eager-mode API still works
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", UserWarning)
+        quantized = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return quantized.eval()
+
+
+def load_backend(model, backend: str):
+    """Model to run for 'backend' ('fp32' returns 'model' itself)."""
+    if backend == "fp32":
+        return model
+    if backend == "int8":
+        return quantize_model(model)
+    raise ValueError(f"Unknown backend {backend!r} (expected one of {BACKENDS})")
+
+
+def cosine_similarities(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity of two (n, dim) matrices."""
+    dot = np.sum(reference * candidate, axis=1)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    return dot / np.maximum(norms, 1e-12)
+
+
+def _cv_accuracy(embeddings: np.ndarray, labels: np.ndarray, cv: int) -> float:
+    from sklearn.linear_model import LogisticRegression
+
+    from classifiers.evaluation import cross_validate_once
+
+    result = cross_validate_once(
+        LogisticRegression(max_iter=1000), embeddings, labels, cv=cv
+    )
+    return result.accuracy_mean
+
+
+def parity_report(
+    reference: Dict[str, np.ndarray],
+    candidate: Dict[str, np.ndarray],
+    labels: Dict[str, np.ndarray],
+    seconds: Dict[str, Dict[str, float]] = None,
+    cv: int = 5,
+) -> dict:
+    """
+    Compare embeddings of the same sample from fp32 ('reference') and another
+    backend ('candidate'), keyed by modality ("image", "text"), with the class
+    'labels' of each modality's sample.
+    'seconds' optionally holds {"fp32": {modality: s}, "candidate": {...}} timings.
+    """
+    report = {}
+    for modality, ref in reference.items():
+        cand = candidate[modality]
+        folds = min(cv, np.bincount(labels[modality], minlength=2).min())
+        cosine = cosine_similarities(ref, cand)
+        entry = {
+            "n": len(ref),
+            "cosine_mean": float(cosine.mean()),
+            "cosine_min": float(cosine.min()),
+        }
+        if folds >= 2:
+            entry["accuracy_fp32"] = _cv_accuracy(ref, labels[modality], folds)
+            entry["accuracy"] = _cv_accuracy(cand, labels[modality], folds)
+            entry["accuracy_delta"] = entry["accuracy"] - entry["accuracy_fp32"]
+        if seconds:
+            fp32_s, cand_s = seconds["fp32"][modality], seconds["candidate"][modality]
+            entry["items_per_sec_fp32"] = len(ref) / fp32_s
+            entry["items_per_sec"] = len(ref) / cand_s
+            entry["speedup"] = fp32_s / cand_s
+        report[modality] = entry
+    return report
+
+
+def print_parity(report: dict, backend: str) -> bool:
+    """Print the report; returns whether every modality meets PARITY_MIN_COSINE."""
+    ok = True
+    print(f"Parity of the {backend} backend against fp32:")
+    for modality, entry in report.items():
+        line = (
+            f"  {modality}: n={entry['n']}, cosine mean {entry['cosine_mean']:.4f} "
+            f"(min {entry['cosine_min']:.4f})"
+        )
+        if "accuracy" in entry:
+            line += (
+                f", LR accuracy {entry['accuracy']:.3f} vs {entry['accuracy_fp32']:.3f} "
+                f"({entry['accuracy_delta']:+.3f})"
+            )
+        if "speedup" in entry:
+            line += (
+                f", {entry['items_per_sec']:.1f} vs {entry['items_per_sec_fp32']:.1f} "
+                f"items/sec ({entry['speedup']:.2f}x)"
+            )
+        print(line)
+        ok = ok and entry["cosine_mean"] >= PARITY_MIN_COSINE
+    return ok
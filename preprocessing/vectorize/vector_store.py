@@ -0,0 +1,237 @@
+"""
+Consolidated on-disk format for CLIP embedding sets.
+
+Each embedding set (e.g. image/high_info, image/low_info/dropout_50, text/low_info)
+lives in a single directory under vector_store/packed/<set_name>/ containing:
+
+    vectors.npy   one contiguous (n_samples, dim) float32 matrix, memory-mappable
+    index.json    sidecar index with the sample IDs and labels, row-aligned with vectors.npy
+
+Loading a set therefore costs two file opens no matter how many samples it holds,
+instead of one glob plus one np.load per sample.
+
+Run this script once to migrate the legacy one-.npy-per-sample layout:
+
+    python preprocessing/vectorize/vector_store.py
+"""
+
+import os
+import sys
+import json
+import numpy as np
+from pathlib import Path
+from typing import List, Sequence, Tuple, Union
+
+# Allow file importing from parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from instrumentation.tracing import traced
+
+VECTOR_STORE = "vector_store"
+PACKED_ROOT = Path(VECTOR_STORE) / "packed"
+
+VECTORS_FILE = "vectors.npy"
+INDEX_FILE = "index.json"
+
+# 0 = cat, 1 = dog
+CLASS_NAMES = ["cat", "dog"]
+
+# Packed set name -> legacy directory (relative to VECTOR_STORE)
+LEGACY_SETS = {
+    "image/high_info": "image_embeddings/high_info",
+    "image/low_info/dropout_25": "image_embeddings/low_info/dropout_25",
+    "image/low_info/dropout_50": "image_embeddings/low_info/dropout_50",
+    "image/low_info/dropout_75": "image_embeddings/low_info/dropout_75",
+    "image/low_info/dropout_90": "image_embeddings/low_info/dropout_90",
+    "text/high_info": "text_embeddings/high_info",
+    "text/low_info": "text_embeddings/low_info",
+}
+
+PathLike = Union[str, Path]
+
+
+def label_from_id(sample_id: str) -> int:
+    """Return the class label encoded in a sample ID (e.g. 'cat.1000' -> 0)."""
+    return 0 if "cat" in sample_id else 1
+
+
+def image_set_name(image_level: str, dropout_level: int = None) -> str:
+    """Return the packed set name for an image info level (and dropout, if low_info)."""
+    if image_level == "low_info":
+        return f"image/low_info/dropout_{dropout_level}"
+    return f"image/{image_level}"
+
+
+def text_set_name(text_level: str) -> str:
+    """Return the packed set name for a text info level."""
+    return f"text/{text_level}"
+
+
+def resolve_set_dir(name: PathLike, root: PathLike = PACKED_ROOT) -> Path:
+    """
+    Resolve a set name (e.g. 'text/high_info') to its directory under 'root'.
+    A path that already points at a packed set directory is returned unchanged.
+    """
+    path = Path(name)
+    if is_packed_set(path):
+        return path
+    return Path(root) / name
+
+
+def is_packed_set(path: PathLike) -> bool:
+    path = Path(path)
+    return (path / VECTORS_FILE).is_file() and (path / INDEX_FILE).is_file()
+
+
+@traced()
+def write_embedding_set(
+    name: PathLike,
+    vectors: np.ndarray,
+    ids: Sequence[str],
+    root: PathLike = PACKED_ROOT,
+    keys: Sequence[str] = None,
+    source: str = None,
+) -> Path:
+    """
+    Write 'vectors' (n_samples, dim) and their sample IDs as one packed set.
+    Optional per-row content 'keys' (see embedding_cache.py) are kept in the index,
+    as is 'source', the script that built the set if it was not built from a folder
+    by create_embeddings.py.
+    Both files are written to temporary names first and then moved into place,
+    so an interrupted write never leaves a half-updated set behind.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ids = [str(i) for i in ids]
+    if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+        raise ValueError(
+            f"Expected a (n_samples, dim) matrix with one row per ID, "
+            f"got shape {vectors.shape} for {len(ids)} IDs"
+        )
+
+    set_dir = Path(root) / name
+    set_dir.mkdir(parents=True, exist_ok=True)
+
+    index = {
+        "ids": ids,
+        "labels": [label_from_id(i) for i in ids],
+        "dim": int(vectors.shape[1]),
+        "dtype": "float32",
+    }
+    if keys is not None:
+        index["keys"] = list(keys)
+    if source is not None:
+        index["source"] = source
+
+    tmp_vectors = set_dir / f".{VECTORS_FILE}.tmp"
+    tmp_index = set_dir / f".{INDEX_FILE}.tmp"
+    with open(tmp_vectors, "wb") as f:
+        np.save(f, vectors)
+    with open(tmp_index, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_vectors, set_dir / VECTORS_FILE)
+    os.replace(tmp_index, set_dir / INDEX_FILE)
+    return set_dir
+
+
+@traced()
+def load_embedding_set(
+    name: PathLike, root: PathLike = PACKED_ROOT, mmap: bool = True
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Load a packed embedding set and return (X, y, ids).
+    With mmap=True the matrix is memory-mapped read-only instead of copied into RAM.
+    """
+    set_dir = resolve_set_dir(name, root)
+    if not is_packed_set(set_dir):
+        raise FileNotFoundError(
+            f"No packed embedding set at {set_dir}. "
+            f"Run preprocessing/vectorize/vector_store.py to migrate legacy embeddings."
+        )
+
+    with open(set_dir / INDEX_FILE, "r") as f:
+        index = json.load(f)
+
+    vectors = np.load(set_dir / VECTORS_FILE, mmap_mode="r" if mmap else None)
+    labels = np.asarray(index["labels"], dtype=np.int64)
+    return vectors, labels, index["ids"]
+
+
+def load_set_index(name: PathLike, root: PathLike = PACKED_ROOT) -> dict:
+    """
+    Return the sidecar index of a packed set, or an empty dict if the set is
+    missing or its index does not match its matrix (e.g. an interrupted write).
+    """
+    set_dir = resolve_set_dir(name, root)
+    if not is_packed_set(set_dir):
+        return {}
+
+    with open(set_dir / INDEX_FILE, "r") as f:
+        index = json.load(f)
+    vectors = np.load(set_dir / VECTORS_FILE, mmap_mode="r")
+    if vectors.ndim != 2 or vectors.shape[0] != len(index.get("ids", [])):
+        return {}
+    return index
+
+
+def load_legacy_folder(path: PathLike) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Load a legacy one-.npy-per-sample folder as (X, y, ids), sorted by ID."""
+    files = sorted(Path(path).glob("*.npy"), key=lambda file: file.stem)
+    ids = [file.stem for file in files]
+    if not files:
+        return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64), ids
+
+    vectors = np.stack([np.load(file) for file in files]).astype(np.float32)
+    labels = np.array([label_from_id(i) for i in ids], dtype=np.int64)
+    return vectors, labels, ids
+
+
+def load_vectors_labels(source) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load (X, y) from a packed set directory, a legacy .npy folder, or any
+    in-memory view exposing 'vectors' and 'labels' (e.g. a FusedView).
+    """
+    if hasattr(source, "vectors") and hasattr(source, "labels"):
+        return source.vectors, source.labels
+    if is_packed_set(source):
+        vectors, labels, _ = load_embedding_set(source)
+    else:
+        vectors, labels, _ = load_legacy_folder(source)
+    return vectors, labels
+
+
+def migrate_legacy_layout(
+    store_root: PathLike = VECTOR_STORE,
+    packed_root: PathLike = PACKED_ROOT,
+    overwrite: bool = False,
+):
+    """
+    Pack every legacy embedding directory listed in LEGACY_SETS into the
+    consolidated format. Existing packed sets are left alone unless overwrite=True.
+    Migrated sets carry no content keys; create_embeddings.py keys them on its
+    first run when their IDs match the input files, instead of re-embedding them.
+    """
+    for name, legacy_dir in LEGACY_SETS.items():
+        legacy_path = Path(store_root) / legacy_dir
+        set_dir = Path(packed_root) / name
+
+        if not legacy_path.is_dir():
+            print(f"  [Skip] {legacy_path} not found.")
+            continue
+
+        if is_packed_set(set_dir) and not overwrite:
+            print(f"  [Skip] {set_dir} already packed.")
+            continue
+
+        vectors, _, ids = load_legacy_folder(legacy_path)
+        if not ids:
+            print(f"  [Skip] {legacy_path} has no embeddings.")
+            continue
+
+        write_embedding_set(name, vectors, ids, root=packed_root)
+        print(f"  ✓ Packed {len(ids)} embeddings {vectors.shape} -> {set_dir}")
+
+
+if __name__ == "__main__":
+    print("=== Vector Store Migration ===")
+    migrate_legacy_layout()
+    print(f"\n✅ Packed embedding sets saved to: {PACKED_ROOT}")